@@ -1,8 +1,14 @@
+from IoTHealth.csv_store import append_csv, write_csv, repair_csv_tail
 from IoTHealth.google_sheet import GoogleSheet
-import pandas as pd
+from IoTHealth.rollups import Rollups, view_range
+from IoTHealth.sqlite_store import SQLiteStore
 import datetime as dt
+import os
+import numpy as np
+import pandas as pd
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
 
 
 class BodyComposition(object):
@@ -10,7 +16,11 @@ class BodyComposition(object):
     Interact with body composition dataFrame
     """
 
-    def __init__(self, spreadsheet_id, sheet_range, labels, index, index_type):
+    # measurements keep time of day in body_raw.csv, daily means are stored by date in body.csv
+    raw_date_format = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, spreadsheet_id, sheet_range, labels, index, index_type, sheet_cache_file_path=None,
+                 body_file_path=None, store_file_path=None):
         """
         format dataFrame and initialize plot attributes
         :param spreadsheet_id: string of id located after '/d/' in
@@ -19,22 +29,37 @@ class BodyComposition(object):
         :param labels: list of strings of dataFrame labels
         :param index: string of dataFrame index
         :param index_type: string of dataFrame index type
+        :param sheet_cache_file_path: string of absolute file-path to json cache of sheet values, optional
+        :param body_file_path: string of absolute file-path to body.csv of daily means, optional
+                               raw measurements are stored beside it, as body_raw.csv
+        :param store_file_path: string of absolute file-path to SQLite store, optional
+                                replaces body.csv and body_raw.csv, which are imported into empty store
         """
 
-        # format df
-        self.sheet = GoogleSheet(spreadsheet_id, sheet_range)
-        df = self.sheet.sheet2df(labels, index, index_type)
-        df = df.apply(pd.to_numeric, errors='coerce')
-        cols = df.columns.difference([index])
-        df[cols] = df[cols].astype(float)
-        df = df.resample('d').mean().dropna(how='all')
-        df[cols] = df[cols].round(decimals=2)
-        self.df = df
-
-        # initialize plot attributes
-        self.body_fig = plt.figure(dpi=100)
-        plt.rc('xtick', labelsize=18)
-        plt.rc('ytick', labelsize=18)
+        # initialize data attributes
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_range = sheet_range
+        self.labels = labels
+        self.index = index
+        self.index_type = index_type
+        self.sheet_cache_file_path = sheet_cache_file_path
+        self.body_file_path = body_file_path
+        if body_file_path is not None:
+            self.raw_file_path = os.path.splitext(body_file_path)[0] + '_raw.csv'
+        self.store = SQLiteStore(store_file_path) if store_file_path is not None else None
+        self.sheet = None
+        self.trend_days = 7
+
+        # import local stores into empty SQLite store
+        if self.store is not None and not self.store.count('body_measurements') and body_file_path is not None \
+                and os.path.isfile(self.raw_file_path) and os.path.isfile(self.body_file_path):
+            self.import_local_stores()
+
+        # capture up-to-date daily means
+        self.sync()
+
+        # initialize plot attributes, figure is created on first plot
+        self.figure = None
         self.title_pad = 20
         self.title_font_size = 30
         self.label_font_size = 20
@@ -42,14 +67,402 @@ class BodyComposition(object):
         self.twin_label_pad = 30
         self.twin_label_rotation = 270
         self.line_width = 2
+        self.max_points = 400
+        self.band_alpha = 0.2
         self.date_format = '%a-%b-%d'
-        self.x_min = df.index.tolist()[0] - dt.timedelta(days=1)
-        self.x_max = df.index.tolist()[-1] + dt.timedelta(days=1)
+        self.rollup_date_format = '%b-%y'
+        self.line_artists = []
 
         # initialize legend parameters
         self.legend_size = 20
         self.legend_loc = 'upper right'
 
+    def sync(self):
+        """
+        capture daily means from SQLite store or local stores updated with new measurements,
+        or from all measurements of sheet
+        called again on long-running instances to refresh data before update_plots()
+        """
+
+        if self.store is not None:
+            self.df = self.sync_store()
+        elif self.body_file_path is None:
+            self.sheet = GoogleSheet(self.spreadsheet_id, self.sheet_range, self.sheet_cache_file_path, typed=True)
+            self.df = self.daily_means(self.sheet.sheet2df(self.labels, self.index, self.index_type))
+        else:
+            self.df = self.sync_local_stores()
+        self.x_min = self.summary['first_date'].min() - dt.timedelta(days=1)
+        self.x_max = self.summary['last_date'].max() + dt.timedelta(days=1)
+
+    @property
+    def df(self):
+        """
+        :return: dataFrame of daily means
+        """
+
+        return self.frame
+
+    @df.setter
+    def df(self, frame):
+        """
+        replace daily means, so summary and rollups are recomputed for new data
+        :param frame: dataFrame of daily means
+        """
+
+        self.frame = frame
+        self.summary_cache = None
+        self.rollups_cache = None
+
+    @property
+    def summary(self):
+        """
+        compute summary of each column once per data version, in single pass over all columns:
+            -min and max
+            -first_date and last_date of valid values
+            -latest valid value
+            -rolling_mean over trend_days ending at last day of df
+            -trend, change of rolling_mean over previous trend_days, nan for shorter histories
+        :return: dataFrame of summary statistics, indexed by column label
+        """
+
+        if self.summary_cache is None:
+            # capture rows of first and last valid values of each column, NaT and nan for columns without values
+            values = self.df.to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            any_valid = valid.any(axis=0)
+            first = valid.argmax(axis=0)
+            last = len(values) - 1 - valid[::-1].argmax(axis=0)
+            columns = np.arange(values.shape[1])
+
+            # capture rolling means at last day and trend_days before it
+            window = dt.timedelta(days=self.trend_days)
+            rolling = self.df.rolling(window, min_periods=1).mean().to_numpy(dtype=float)
+            previous = self.df.index.searchsorted(self.df.index[-1] - window, side='right') - 1
+            trend = rolling[-1] - rolling[previous] if previous >= 0 else np.full(values.shape[1], np.nan)
+
+            self.summary_cache = pd.DataFrame({'min': self.df.min(),
+                                               'max': self.df.max(),
+                                               'first_date': self.df.index[first].where(any_valid),
+                                               'last_date': self.df.index[last].where(any_valid),
+                                               'latest': np.where(any_valid, values[last, columns], np.nan),
+                                               'rolling_mean': rolling[-1],
+                                               'trend': trend}, index=self.df.columns)
+
+        return self.summary_cache
+
+    @property
+    def rollups(self):
+        """
+        aggregate weekly and monthly rollups once per data version
+        :return: Rollups object of df
+        """
+
+        if self.rollups_cache is None:
+            self.rollups_cache = Rollups(self.df)
+
+        return self.rollups_cache
+
+    def date_formatter(self, start, end):
+        """
+        :param start: datetime of first date plotted
+        :param end: datetime of last date plotted
+        :return: DateFormatter of days, or of months when plotted span is drawn from weekly or monthly rollups
+        """
+
+        if self.rollups.select(start, end, self.max_points) == 'day':
+            return mdates.DateFormatter(self.date_format)
+
+        return mdates.DateFormatter(self.rollup_date_format)
+
+    def plot_line(self, ax, column, line_style, label, y_pad=None):
+        """
+        plot column at level of detail of plotted span, daily when it fits max_points,
+        otherwise as downsampled line over band of weekly or monthly range
+        artists are kept in self.line_artists and refilled by pan_lines() when axes are panned or zoomed
+        :param ax: axes object
+        :param column: string of dataFrame column
+        :param line_style: string of line style
+        :param label: string of line label
+        :param y_pad: float of padding of y-axis limits around range of column, None for autoscaled y-axis
+        :return: list of line objects
+        """
+
+        # initialize parameters
+        start = self.x_min + dt.timedelta(days=1)
+        end = self.x_max - dt.timedelta(days=1)
+
+        # plot line and band, scaling axes to band as filled areas would
+        dates, values = self.rollups.line(column, start, end, self.max_points)
+        lines = ax.plot(dates, values, line_style, label=label, linewidth=self.line_width)
+        band = PolyCollection([], facecolors=lines[0].get_color(), edgecolors='none', alpha=self.band_alpha)
+        ax.add_collection(band, autolim=False)
+        band.set_verts([self.band_verts(self.rollups.band(column, start, end, self.max_points))])
+        if len(band.get_paths()[0].vertices):
+            ax.update_datalim(band.get_paths()[0].vertices)
+
+        ax.xaxis.set_major_formatter(self.date_formatter(start, end))
+
+        # refill lines of axes when panned or zoomed
+        if not any(artists['ax'] is ax for artists in self.line_artists):
+            ax.callbacks.connect('xlim_changed', self.pan_lines)
+        self.line_artists.append({'ax': ax, 'column': column, 'line': lines[0], 'band': band,
+                                  'y_pad': y_pad, 'view': (start, end)})
+
+        return lines
+
+    @staticmethod
+    def band_verts(band):
+        """
+        convert band of period ranges to polygon vertices, skipping periods without measurements
+        :param band: tuple returned by Rollups.band(), or None
+        :return: array of (vertices, 2) polygon vertices
+        """
+
+        if band is None:
+            return np.zeros((0, 2))
+        (centres, mins, maxs) = band
+        valid = ~(np.isnan(mins) | np.isnan(maxs))
+        x = mdates.date2num(centres[valid])
+
+        return np.concatenate([np.column_stack([x, maxs[valid]]), np.column_stack([x[::-1], mins[valid][::-1]])])
+
+    def fill_line(self, artists, start, end):
+        """
+        refill line and band with column from start to end, at level of detail of span
+        :param artists: dictionary of line artists from self.line_artists
+        :param start: datetime of first date
+        :param end: datetime of last date
+        """
+
+        artists['line'].set_data(*self.rollups.line(artists['column'], start, end, self.max_points))
+        artists['band'].set_verts([self.band_verts(self.rollups.band(artists['column'], start, end,
+                                                                     self.max_points))])
+        artists['ax'].xaxis.set_major_formatter(self.date_formatter(start, end))
+        artists['view'] = (start, end)
+
+    def pan_lines(self, ax):
+        """
+        refill lines of axes and its twin with data visible after pan or zoom, called on xlim_changed
+        :param ax: axes object
+        """
+
+        view = view_range(ax)
+        siblings = ax.get_shared_x_axes().get_siblings(ax)
+        for artists in self.line_artists:
+            if artists['ax'] in siblings and artists['view'] != view:
+                self.fill_line(artists, *view)
+
+    def update_plots(self):
+        """
+        update lines and axis limits of existing plots in place with current df, showing full history
+        :return: list of axes updated
+        """
+
+        # reset x-axis limits, refilling lines of each axes through pan_lines()
+        axes = []
+        for artists in self.line_artists:
+            artists['view'] = None
+            if artists['ax'] not in axes:
+                axes.append(artists['ax'])
+        for ax in axes:
+            ax.set_xlim(self.x_min, self.x_max)
+
+        # reset y-axis limits
+        for artists in self.line_artists:
+            ax = artists['ax']
+            if artists['y_pad'] is not None:
+                ax.set_ylim(self.summary.at[artists['column'], 'min'] - artists['y_pad'],
+                            self.summary.at[artists['column'], 'max'] + artists['y_pad'])
+            else:
+                ax.relim()
+                ax.update_datalim(artists['band'].get_paths()[0].vertices)
+                ax.autoscale_view(scalex=False)
+
+        return axes
+
+    @staticmethod
+    def daily_means(measurements):
+        """
+        :param measurements: dataFrame of measurements with datetime index
+        :return: dataFrame of daily means, excluding days without measurements
+        """
+
+        return measurements.resample('d').mean().dropna(how='all').round(decimals=2)
+
+    def sync_local_stores(self):
+        """
+        append new sheet measurements to body_raw.csv and re-aggregate only days they touch into body.csv
+        local stores are used as is when sheet cannot be reached
+        :return: dataFrame of daily means
+        """
+
+        from googleapiclient.errors import HttpError
+        from httplib2 import HttpLib2Error
+
+        # capture local stores, if available
+        raw = None
+        daily = None
+        if os.path.isfile(self.raw_file_path) and os.path.isfile(self.body_file_path):
+            repair_csv_tail(self.raw_file_path)
+            repair_csv_tail(self.body_file_path)
+            raw = pd.read_csv(self.raw_file_path, index_col=self.index, parse_dates=True)
+            daily = pd.read_csv(self.body_file_path, index_col=self.index, parse_dates=True)
+            raw.index = raw.index.astype(self.index_type)
+            daily.index = daily.index.astype(self.index_type)
+
+        # request measurements, starting offline from local stores when sheet cannot be reached
+        try:
+            self.sheet = GoogleSheet(self.spreadsheet_id, self.sheet_range, self.sheet_cache_file_path, typed=True)
+            measurements = self.sheet.sheet2df(self.labels, self.index, self.index_type)
+        except (OSError, HttpLib2Error, HttpError):
+            if daily is None:
+                raise
+            return daily
+
+        # rewrite stores when missing or when stored measurements are no longer leading rows of sheet,
+        # comparing values as well as times, so corrected measurements replace stored ones
+        if raw is None or not measurements.iloc[:len(raw)].equals(raw):
+            daily = self.daily_means(measurements)
+            write_csv(measurements, self.raw_file_path, date_format=self.raw_date_format)
+            write_csv(daily, self.body_file_path)
+            return daily
+
+        # append new measurements and re-aggregate days they touch
+        new = measurements.iloc[len(raw):]
+        if new.empty:
+            return daily
+        append_csv(new, self.raw_file_path, date_format=self.raw_date_format)
+        touched = new.index.normalize().unique()
+        recent = pd.concat([raw[raw.index >= touched.min()], new])
+        touched_means = self.daily_means(recent[recent.index.normalize().isin(touched)])
+
+        # update body.csv, appending new days or compacting file when stored days are revised
+        if touched.min() > daily.index.max():
+            append_csv(touched_means, self.body_file_path)
+            daily = pd.concat([daily, touched_means])
+        else:
+            daily = pd.concat([daily.drop(touched, errors='ignore'), touched_means]).sort_index()
+            write_csv(daily, self.body_file_path)
+
+        return daily
+
+    def sync_store(self):
+        """
+        upsert new sheet measurements into body_measurements table and re-aggregate only days they touch
+        into body_daily table, reading stored measurements of touched days only
+        measurements are keyed by time, so later rows of same time replace earlier ones
+        times and values of stored measurements are checked against leading rows of sheet by checksum,
+        so corrected measurements are rewritten without reading stored measurements in full
+        SQLite store is used as is when sheet cannot be reached
+        :return: dataFrame of daily means
+        """
+
+        from googleapiclient.errors import HttpError
+        from httplib2 import HttpLib2Error
+
+        # capture count and checksum of stored measurements
+        stored = self.store.count('body_measurements')
+        stored_checksum = self.store.read_value('body_measurements_checksum')
+
+        # request measurements, starting offline from SQLite store when sheet cannot be reached
+        try:
+            self.sheet = GoogleSheet(self.spreadsheet_id, self.sheet_range, self.sheet_cache_file_path, typed=True)
+            measurements = self.sheet.sheet2df(self.labels, self.index, self.index_type)
+        except (OSError, HttpLib2Error, HttpError):
+            if not stored:
+                raise
+            return self.store.read('body_daily')
+        measurements = measurements[~measurements.index.duplicated(keep='last')]
+
+        # rewrite tables when empty or when stored measurements are no longer leading rows of sheet,
+        # checksum is stored after tables, so interrupted writes are rewritten on next sync
+        if not stored or stored > len(measurements) or \
+                self.checksum(measurements.iloc[:stored]) != stored_checksum:
+            self.store.write('body_measurements', measurements)
+            self.store.write('body_daily', self.daily_means(measurements))
+            self.store.write_value('body_measurements_checksum', self.checksum(measurements))
+            return self.store.read('body_daily')
+
+        # upsert new measurements and re-aggregate days they touch
+        new = measurements.iloc[stored:]
+        if not new.empty:
+            self.store.upsert('body_measurements', new)
+            touched = new.index.normalize().unique()
+            recent = self.store.read('body_measurements', start=touched.min())
+            self.store.upsert('body_daily', self.daily_means(recent[recent.index.normalize().isin(touched)]))
+            self.store.write_value('body_measurements_checksum', self.checksum(measurements))
+
+        return self.store.read('body_daily')
+
+    @staticmethod
+    def checksum(measurements):
+        """
+        :param measurements: dataFrame of measurements
+        :return: string of hex checksum of times and values of measurements
+        """
+
+        hashes = pd.util.hash_pandas_object(measurements, index=True).to_numpy()
+
+        return format(int(hashes.sum(dtype=np.uint64)), '016x')
+
+    def import_local_stores(self):
+        """
+        import body_raw.csv and body.csv into SQLite store
+        """
+
+        repair_csv_tail(self.raw_file_path)
+        repair_csv_tail(self.body_file_path)
+        raw = pd.read_csv(self.raw_file_path, index_col=self.index, parse_dates=True)
+        daily = pd.read_csv(self.body_file_path, index_col=self.index, parse_dates=True)
+        raw.index = raw.index.astype(self.index_type)
+        raw = raw[~raw.index.duplicated(keep='last')]
+        self.store.write('body_measurements', raw)
+        self.store.write('body_daily', daily)
+        self.store.write_value('body_measurements_checksum', self.checksum(raw))
+
+    @property
+    def body_fig(self):
+        """
+        create figure on first access, so body composition data can be captured off the main thread
+        :return: figure object of body composition plots
+        """
+
+        if self.figure is None:
+            self.figure = plt.figure(dpi=100)
+            plt.rc('xtick', labelsize=18)
+            plt.rc('ytick', labelsize=18)
+
+        return self.figure
+
+    def plot_page(self, figure_size, grid=(5, 2)):
+        """
+        plot all body composition plots on body_fig, as shown by dashboard
+        :param figure_size: tuple of (width, height) figure size in inches
+        :param grid: tuple of (row, column) form, with at least 5 rows and 2 columns
+        :return: figure object
+        """
+
+        self.body_fig.set_size_inches(figure_size)
+        self.plot_total_mass(grid, plot_position=(0, 0), column_span=2, figure=self.body_fig)
+        self.plot_muscle(grid, plot_position=(1, 0), column_span=2, figure=self.body_fig)
+        self.plot_fat(grid, plot_position=(2, 0), column_span=2, figure=self.body_fig)
+        self.plot_bone(grid, plot_position=(3, 0), column_span=2, figure=self.body_fig)
+        self.plot_water_percent(grid, plot_position=(4, 0), column_span=1, figure=self.body_fig)
+        self.plot_bmi(grid, plot_position=(4, 1), column_span=1, figure=self.body_fig)
+
+        return self.body_fig
+
+    def __getstate__(self):
+        """
+        drop sheet connection, figure and artists when pickled, so body composition data can be plotted in other processes
+        :return: dictionary of instance attributes
+        """
+
+        state = self.__dict__.copy()
+        state.update(sheet=None, figure=None, line_artists=[])
+
+        return state
+
     def plot_single(self, y_index, grid_shape, plot_position,
                     column_span, figure, title, y_label, line_style):
         """
@@ -65,8 +478,8 @@ class BodyComposition(object):
         """
 
         # initialize y-axis limits
-        y_min = float(self.df[[y_index]].min()-1)
-        y_max = float(self.df[[y_index]].max()+1)
+        y_min = self.summary.at[y_index, 'min'] - 1
+        y_max = self.summary.at[y_index, 'max'] + 1
 
         # setup plot
         ax = plt.subplot2grid(grid_shape, plot_position, colspan=column_span, fig=figure)
@@ -75,8 +488,7 @@ class BodyComposition(object):
         ax.set_ylabel(y_label, fontsize=self.label_font_size, labelpad=self.label_pad)
         ax.set_xlim(self.x_min, self.x_max)
         ax.set_ylim(y_min, y_max)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter(self.date_format))
-        ax.plot(self.df.index, self.df[[y_index]], line_style, label=y_label, linewidth=self.line_width)
+        self.plot_line(ax, y_index, line_style, y_label, y_pad=1)
 
     def plot_twin(self, index_mass, index_percent, grid_shape, plot_position,
                   column_span, figure, title, line_style_mass, line_style_percent):
@@ -95,8 +507,8 @@ class BodyComposition(object):
         """
 
         # initialize y-axis limits
-        y_min = float(self.df[[index_mass]].min()-0.25)
-        y_max = float(self.df[[index_mass]].max()+0.25)
+        y_min = self.summary.at[index_mass, 'min'] - 0.25
+        y_max = self.summary.at[index_mass, 'max'] + 0.25
 
         # setup mass plot
         ax_mass = plt.subplot2grid(grid_shape, plot_position, colspan=column_span, fig=figure)
@@ -104,17 +516,14 @@ class BodyComposition(object):
         ax_mass.set_title(title, fontsize=self.title_font_size, pad=self.title_pad)
         ax_mass.set_ylabel('Mass (lb)', fontsize=self.label_font_size, labelpad=self.label_font_size)
         ax_mass.set_ylim(y_min, y_max)
-        line_mass = ax_mass.plot(self.df.index, self.df[[index_mass]], line_style_mass,
-                                 label='Mass (lb)', linewidth=self.line_width)
+        line_mass = self.plot_line(ax_mass, index_mass, line_style_mass, 'Mass (lb)', y_pad=0.25)
 
         # setup percentage plot
         ax_percent = ax_mass.twinx()
         ax_percent.set_ylabel('Percentage', fontsize=self.label_font_size,
                               labelpad=self.twin_label_pad, rotation=self.twin_label_rotation)
         ax_percent.set_xlim(self.x_min, self.x_max)
-        ax_percent.xaxis.set_major_formatter(mdates.DateFormatter(self.date_format))
-        line_percent = ax_percent.plot(self.df.index, self.df[[index_percent]], line_style_percent,
-                                       label='Percentage', linewidth=self.line_width)
+        line_percent = self.plot_line(ax_percent, index_percent, line_style_percent, 'Percentage')
 
         # setup legend
         lines = line_mass + line_percent
@@ -246,7 +655,8 @@ grid = (5, 2)
 plt.rcParams.update({'figure.autolayout': True})
 
 # plot data
-body = BodyComposition(spreadsheet_id, sheet_range, col_labels, index, index_type)
+body_fp = '/home/sosa/Documents/IoTHealth/body.csv'
+body = BodyComposition(spreadsheet_id, sheet_range, col_labels, index, index_type, body_file_path=body_fp)
 body.plot_total_mass(grid, plot_position=(0, 0), column_span=2, figure=body.body_fig)
 body.plot_muscle(grid, plot_position=(1, 0), column_span=2, figure=body.body_fig)
 body.plot_fat(grid, plot_position=(2, 0), column_span=2, figure=body.body_fig)
@@ -259,6 +669,6 @@ plt.show()
 
 # TODO Future Dev
 """
-    1. create csv from df
-    2. update csv when new data available
+    DONE 1. create csv from df
+    DONE 2. update csv when new data available
 """
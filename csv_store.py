@@ -0,0 +1,76 @@
+import os
+
+
+def repair_csv_tail(file_path):
+    """
+    truncate partial row left at end of csv by interrupted append
+    :param file_path: string of absolute file-path to csv
+    """
+
+    with open(file_path, 'rb+') as csv_file:
+        # capture file size, returning if file ends with complete row
+        size = csv_file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        csv_file.seek(size - 1)
+        if csv_file.read(1) == b'\n':
+            return
+
+        # search backwards for end of last complete row
+        position = size
+        while position > 0:
+            block_start = max(0, position - 4096)
+            csv_file.seek(block_start)
+            block = csv_file.read(position - block_start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                csv_file.truncate(block_start + newline + 1)
+                break
+            position = block_start
+        else:
+            csv_file.truncate(0)
+
+        csv_file.flush()
+        os.fsync(csv_file.fileno())
+
+
+def append_csv(frame, file_path, date_format="%Y-%m-%d"):
+    """
+    append rows of dataFrame to existing csv with matching header
+    rows are written with single append and fsync, partial rows of interrupted appends
+    are removed by repair_csv_tail() before next append
+    :param frame: dataFrame of rows to append
+    :param file_path: string of absolute file-path to csv
+    :param date_format: string of date format used for datetime index and columns
+    """
+
+    # verify schema of rows matches csv header
+    with open(file_path, 'r') as csv_file:
+        header = csv_file.readline()
+    if header != frame.iloc[:0].to_csv(date_format=date_format):
+        raise ValueError('columns of appended rows do not match header of ' + file_path)
+
+    # append rows and flush to disk
+    repair_csv_tail(file_path)
+    rows = frame.to_csv(header=False, date_format=date_format).encode('utf-8')
+    with open(file_path, 'ab') as csv_file:
+        csv_file.write(rows)
+        csv_file.flush()
+        os.fsync(csv_file.fileno())
+
+
+def write_csv(frame, file_path, date_format="%Y-%m-%d"):
+    """
+    write dataFrame to temporary csv and atomically replace csv
+    :param frame: dataFrame to write
+    :param file_path: string of absolute file-path to csv
+    :param date_format: string of date format used for datetime index and columns
+    """
+
+    # write temporary file in same directory, so replace stays on one filesystem
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w') as temp_file:
+        frame.to_csv(path_or_buf=temp_file, date_format=date_format)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, file_path)
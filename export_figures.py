@@ -0,0 +1,202 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# select non-interactive backend before plotting classes import pyplot, so figures render without X server
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+plt.rcParams.update({'figure.autolayout': True})
+
+
+def plot_sleep_stages(sleep, figure_size):
+    """
+    :param sleep: Sleep object
+    :param figure_size: tuple of (width, height) figure size in inches
+    :return: figure object
+    """
+
+    sleep.sleep_fig.set_size_inches(figure_size)
+    sleep.plot_stages_percent((1, 1), (0, 0), rowspan=1, colspan=1)
+
+    return sleep.sleep_fig
+
+
+def plot_sleep_efficiency(sleep, figure_size):
+    """
+    :param sleep: Sleep object
+    :param figure_size: tuple of (width, height) figure size in inches
+    :return: figure object
+    """
+
+    sleep.sleep_fig.set_size_inches(figure_size)
+    sleep.plot_efficiency((1, 1), (0, 0), rowspan=1, colspan=1)
+
+    return sleep.sleep_fig
+
+
+def plot_sleep_hypnograms(sleep, figure_size):
+    """
+    :param sleep: Sleep object
+    :param figure_size: tuple of (width, height) figure size in inches, height is limited to row of hypnograms
+    :return: figure object
+    """
+
+    sleep.sleep_fig.set_size_inches(figure_size[0], min(figure_size[1], figure_size[0] / 5))
+    sleep.plot_polar_hypnograms((1, 15), row=0, title_position=(0.51, 0.88))
+
+    return sleep.sleep_fig
+
+
+def plot_body_panel(method):
+    """
+    create panel function plotting single body composition plot
+    :param method: string of BodyComposition plot method name
+    :return: function of (BodyComposition object, figure size) returning figure object
+    """
+
+    def plot_panel(body, figure_size):
+        body.body_fig.set_size_inches(figure_size)
+        getattr(body, method)((1, 1), plot_position=(0, 0), column_span=1, figure=body.body_fig)
+
+        return body.body_fig
+
+    return plot_panel
+
+
+# panels by name, as (data source, function of (data object, figure size) returning figure object)
+PANELS = {'sleep': ('sleep', lambda sleep, figure_size: sleep.plot_page(figure_size)),
+          'sleep_stages': ('sleep', plot_sleep_stages),
+          'sleep_efficiency': ('sleep', plot_sleep_efficiency),
+          'sleep_hypnograms': ('sleep', plot_sleep_hypnograms),
+          'body': ('body', lambda body, figure_size: body.plot_page(figure_size)),
+          'body_mass': ('body', plot_body_panel('plot_total_mass')),
+          'body_muscle': ('body', plot_body_panel('plot_muscle')),
+          'body_fat': ('body', plot_body_panel('plot_fat')),
+          'body_bone': ('body', plot_body_panel('plot_bone')),
+          'body_water': ('body', plot_body_panel('plot_water_percent')),
+          'body_bmi': ('body', plot_body_panel('plot_bmi'))}
+
+
+def capture_data(sources, args):
+    """
+    sync data of each source once in parent process
+    :param sources: set of data source names from PANELS
+    :param args: argparse namespace of command-line arguments
+    :return: dictionary of data objects by source name
+    """
+
+    data = {}
+    if 'sleep' in sources:
+        from IoTHealth.sleep import Sleep
+        data['sleep'] = Sleep(args.sleep_logs, args.sleep_series, args.tokens, args.store)
+    if 'body' in sources:
+        from IoTHealth.body_composition import BodyComposition
+        data['body'] = BodyComposition(args.spreadsheet_id, args.sheet_range, args.col_labels,
+                                       args.col_labels[0], 'datetime64[ns]', args.sheet_cache, args.body_logs,
+                                       args.store)
+
+    return data
+
+
+def render_panel(panel, data, figure_size, dpi, formats, output_dir):
+    """
+    plot panel and write it in each format, run in worker process
+    files are written to temporary paths and atomically replaced, so readers never see partial images
+    :param panel: string of panel name from PANELS
+    :param data: data object of panel source
+    :param figure_size: tuple of (width, height) figure size in inches
+    :param dpi: integer of dots per inch
+    :param formats: list of strings of file formats, such as 'png' or 'svg'
+    :param output_dir: string of absolute path to output directory
+    :return: list of strings of absolute paths written
+    """
+
+    (source, plot) = PANELS[panel]
+    figure = plot(data, figure_size)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, panel + '.' + fmt)
+        figure.savefig(path + '.tmp', format=fmt, dpi=dpi)
+        os.replace(path + '.tmp', path)
+        paths.append(path)
+    plt.close(figure)
+
+    return paths
+
+
+def export_figures(args):
+    """
+    sync data once, then render requested panels in parallel worker processes
+    :param args: argparse namespace of command-line arguments
+    :return: list of strings of absolute paths written
+    """
+
+    # initialize parameters
+    panels = list(dict.fromkeys(args.panels))
+    figure_size = (args.width / args.dpi, args.height / args.dpi)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # capture data, then pass data objects to workers, which plot independent figures
+    data = capture_data(set(PANELS[panel][0] for panel in panels), args)
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(panels))) as executor:
+        futures = [executor.submit(render_panel, panel, data[PANELS[panel][0]], figure_size,
+                                   args.dpi, args.formats, args.output_dir) for panel in panels]
+        paths = [path for future in futures for path in future.result()]
+
+    return paths
+
+
+def parse_args(argv=None):
+    """
+    :param argv: list of strings of command-line arguments, default reads sys.argv
+    :return: argparse namespace
+    """
+
+    parser = argparse.ArgumentParser(description='render sleep and body composition figures without a display')
+    parser.add_argument('panels', nargs='*', metavar='panel',
+                        help='pages or panels to render, from: ' + ', '.join(sorted(PANELS)) +
+                             ' (default: sleep body)')
+    parser.add_argument('-o', '--output-dir', default='/home/sosa/Documents/IoTHealth/figures')
+    parser.add_argument('-f', '--formats', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--width', type=int, default=1920, help='figure width in pixels')
+    parser.add_argument('--height', type=int, default=980, help='figure height in pixels')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--tokens', default='/home/sosa/Documents/IoTHealth/fitbit_tokens.txt')
+    parser.add_argument('--sleep-logs', default='/home/sosa/Documents/IoTHealth/sleep.csv')
+    parser.add_argument('--sleep-series', default='/home/sosa/Documents/IoTHealth/sleep_series')
+    parser.add_argument('--spreadsheet-id', default='136gvJHeQOirtmTendXnpb19Pa96Tit7Hkt8RR3N2pEI')
+    parser.add_argument('--sheet-range', default='Sheet1')
+    parser.add_argument('--sheet-cache', default='/home/sosa/Documents/IoTHealth/body_sheet.json')
+    parser.add_argument('--body-logs', default='/home/sosa/Documents/IoTHealth/body.csv')
+    parser.add_argument('--store', help='SQLite store of sleep and body data, replacing csv stores '
+                                        '(default: csv stores)')
+    parser.add_argument('--col-labels', nargs='+',
+                        default=['date_time', 'weight_lb', 'fat_%', 'water_%', 'bone_lb',
+                                 'muscle_lb', 'BMI', 'fat_lb', 'bone_%', 'muscle_%'],
+                        help='sheet columns, first column is date index')
+
+    # validate panels here, as argparse rejects empty lists of positional choices
+    args = parser.parse_args(argv)
+    args.panels = args.panels or ['sleep', 'body']
+    unknown = [panel for panel in args.panels if panel not in PANELS]
+    if unknown:
+        parser.error('unknown panels: ' + ', '.join(unknown))
+
+    return args
+
+
+if __name__ == "__main__":
+    for written_path in export_figures(parse_args()):
+        print(written_path)
+
+
+# EXAMPLE using export_figures
+"""
+# render dashboard pages to png, e.g. from cron
+python -m IoTHealth.export_figures -o /home/sosa/Documents/IoTHealth/figures
+
+# render individual panels to png and svg
+python -m IoTHealth.export_figures sleep_hypnograms body_mass body_bmi -f png svg --width 1280 --height 720
+"""
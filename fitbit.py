@@ -1,6 +1,13 @@
 import requests
+from requests.adapters import HTTPAdapter
 import base64
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
+from datetime import timedelta
 
 
 class Fitbit(object):
@@ -22,6 +29,21 @@ class Fitbit(object):
         self.tokens_filepath = tokens_filepath
         self.auth_code = None
 
+        # initialize parameters for windowed range requests
+        self.max_range_days = 100
+        self.max_workers = 4
+        self.token_lock = threading.Lock()
+
+        # initialize pooled session with keep-alive, compression, timeouts and retry parameters
+        self.timeout = (5, 30)
+        self.max_attempts = 5
+        self.backoff_base = 0.5
+        self.backoff_max = 30
+        self.retry_statuses = (429, 500, 502, 503, 504)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers))
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
         # create data for tokens request
         self.auth_data = {'code': self.auth_code,
                           'redirect_uri': 'https://localhost/callback',
@@ -60,7 +82,7 @@ class Fitbit(object):
         """
 
         # request tokens and capture response
-        request = requests.post(url=self.token_url, data=self.auth_data, headers=self.token_headers)
+        request = self.send_request('POST', self.token_url, data=self.auth_data, headers=self.token_headers)
         response = request.json()
 
         try:
@@ -91,7 +113,7 @@ class Fitbit(object):
                         'refresh_token': str(self.refresh_token)}
 
         # request refresh token and capture response
-        request = requests.post(self.token_url, data=refresh_data, headers=self.token_headers)
+        request = self.send_request('POST', self.token_url, data=refresh_data, headers=self.token_headers)
         response = request.json()
 
         try:
@@ -108,46 +130,129 @@ class Fitbit(object):
 
         return self.access_token, self.refresh_token
 
+    def send_request(self, method, url, **kwargs):
+        """
+        send request using pooled session, retrying rate-limited and server-error responses
+        with exponential backoff and jitter
+            -GET requests are also retried after connection errors and timeouts
+            -POST requests are only retried after 429 responses, as tokens may already be consumed
+        :param method: string of HTTP method
+        :param url: url of request
+        :param kwargs: keyword arguments passed to requests.Session.request()
+        :return: requests.Response of final attempt
+        """
+
+        # initialize parameters
+        if method == 'GET':
+            retry_statuses = self.retry_statuses
+        else:
+            retry_statuses = (429,)
+
+        for attempt in range(self.max_attempts):
+            last_attempt = attempt == self.max_attempts - 1
+            delay = min(self.backoff_max, self.backoff_base * 2**attempt) * random.uniform(0.5, 1.5)
+
+            # send request, retrying connection errors and timeouts of GET requests
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if method != 'GET' or last_attempt:
+                    raise
+                time.sleep(delay)
+                continue
+
+            # return response unless it should be retried
+            if response.status_code not in retry_statuses or last_attempt:
+                return response
+
+            # honour Retry-After of rate-limited responses, giving up if wait exceeds backoff_max
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None and retry_after.isdigit():
+                if int(retry_after) > self.backoff_max:
+                    return response
+                delay = int(retry_after)
+            time.sleep(delay)
+
     def data_request(self, url):
         """
-        request data from Fitbit API
+        request data from Fitbit API, refreshing expired tokens at most once
         :param url: url request for data - formatted according to API
         :return: json response from data request
         """
 
-        # create headers for data request
-        header = {'Authorization': 'Bearer ' + str(self.access_token)}
+        for attempt in range(2):
+            # create headers for data request
+            access_token = self.access_token
+            header = {'Authorization': 'Bearer ' + str(access_token)}
 
-        # request data and capture response
-        request = requests.get(url=url, headers=header)
-        response = request.json()
+            # request data and capture response
+            request = self.send_request('GET', url, headers=header)
+            response = request.json()
 
-        # handle expired token error
-        try:
-            error = response['errors'][0]['errorType']
-            if error == 'invalid_token' or error == 'expired_token':
-                # refresh tokens
-                (self.access_token, self.refresh_token) = self.refresh_tokens()
-                # request data using new tokens and capture response
-                response = self.data_request(url)
-        except KeyError:
-            pass
+            # handle expired token error
+            try:
+                error = response['errors'][0]['errorType']
+            except KeyError:
+                break
+            if attempt == 1 or (error != 'invalid_token' and error != 'expired_token'):
+                break
+
+            # refresh tokens once, unless a concurrent request already refreshed them
+            with self.token_lock:
+                if self.access_token == access_token:
+                    (self.access_token, self.refresh_token) = self.refresh_tokens()
 
         return response
 
+    def split_date_range(self, date_range):
+        """
+        split date range into windows accepted by Fitbit API, latest window first
+        :param date_range: tuple of start and end date strings, respectively (YYYY-mm-dd format)
+        :return: list of (start_date, end_date) tuples
+        """
+
+        # initialize parameters
+        start_date = dt.strptime(date_range[0], "%Y-%m-%d")
+        window_end = dt.strptime(date_range[1], "%Y-%m-%d")
+        windows = []
+
+        # step backwards from end_date in windows of max_range_days
+        while window_end >= start_date:
+            window_start = max(start_date, window_end - timedelta(days=self.max_range_days - 1))
+            windows.append((window_start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+            window_end = window_start - timedelta(days=1)
+
+        return windows
+
     def sleep_logs_range(self, date_range):
         """
         request sleep-logs from Fitbit API for date range
+        ranges longer than max_range_days are requested concurrently in windows and merged
         :param date_range: tuple of start and end date strings, respectively (YYYY-mm-dd format)
-        :return: json response from sleep-logs request
+        :return: json response from sleep-logs request, logs ordered by descending dateOfSleep
         """
 
-        # url formatted according to Fitbit API docs
-        url = 'https://api.fitbit.com/1.2/user/-/sleep/date/' + date_range[0] +\
-              '/' + date_range[1] + '.json'
-
-        # request data and return response
-        return self.data_request(url)
+        # urls formatted according to Fitbit API docs
+        windows = self.split_date_range(date_range)
+        urls = ['https://api.fitbit.com/1.2/user/-/sleep/date/' + window[0] +
+                '/' + window[1] + '.json' for window in windows]
+
+        # request data for each window using bounded thread pool
+        if len(urls) == 1:
+            responses = [self.data_request(urls[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+                responses = list(executor.map(self.data_request, urls))
+
+        # merge responses, returning first error response unmerged
+        sleep_logs = {'sleep': []}
+        for response in responses:
+            if 'sleep' not in response:
+                return response
+            sleep_logs['sleep'].extend(response['sleep'])
+        sleep_logs['sleep'].sort(key=lambda log: log['dateOfSleep'], reverse=True)
+
+        return sleep_logs
 
 # TODO User
 
@@ -1,23 +1,35 @@
-from httplib2 import Http
-from oauth2client import file as oauth_file, client, tools
-from googleapiclient import discovery
-import pandas as pd
+import json
+import os
 
 
 class GoogleSheet(object):
-    def __init__(self, spreadsheet_id, sheet_range):
+    def __init__(self, spreadsheet_id, sheet_range, cache_file_path=None, typed=False):
         """
         request spreadsheet object using Google Sheet API
+        with cache_file_path, rows are cached locally and refreshes request only rows appended since last sync
         :param spreadsheet_id: string of id located after '/d/' in url 'https://docs.google.com/spreadsheets/d/'
         :param sheet_range: string specifying Google sheet range in A1 notation
+        :param cache_file_path: string of absolute file-path to json cache of sheet values, optional
+        :param typed: boolean, request unformatted numbers and serial-number dates instead of formatted strings,
+                      so sheet2df() builds typed columns without parsing strings
         """
 
+        # import Google API client on first use, as building its discovery modules is slow
+        from httplib2 import Http
+        from oauth2client import file as oauth_file, client, tools
+        from googleapiclient import discovery
+
         # init params
         self.spreadsheet_id = spreadsheet_id
         self.sheet_range = sheet_range
-        self.scopes = 'https://www.googleapis.com/auth/spreadsheets.readonly'
-        self.value_render_option = 'FORMATTED_VALUE'
-        self.date_time_render_option = 'FORMATTED_STRING'
+        self.cache_file_path = cache_file_path
+        self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly',
+                       'https://www.googleapis.com/auth/drive.metadata.readonly']
+        self.typed = typed
+        self.value_render_option = 'UNFORMATTED_VALUE' if typed else 'FORMATTED_VALUE'
+        self.date_time_render_option = 'SERIAL_NUMBER' if typed else 'FORMATTED_STRING'
+        self.timeout = 30
+        self.anchor_rows = 31
 
         # acquire tokens from existing file
         self.store = oauth_file.Storage('google_sheet_token.json')
@@ -29,35 +41,156 @@ class GoogleSheet(object):
             self.tokens = tools.run_flow(self.flow, self.store)
 
         # build http address for data requests
-        self.service = discovery.build('sheets', 'v4', http=self.tokens.authorize(Http()))
+        self.http = self.tokens.authorize(Http(timeout=self.timeout))
+        self.service = discovery.build('sheets', 'v4', http=self.http)
+
+        # capture data from request, or from cache and rows appended since last sync
+        if self.cache_file_path is None:
+            self.sheet_obj = self.request_values(self.sheet_range)
+        else:
+            self.sheet_obj = self.sync_values()
 
-        # prepare request
-        self.request = self.service.spreadsheets().values().get(
-            spreadsheetId=self.spreadsheet_id, range=self.sheet_range,
+    def request_values(self, sheet_range):
+        """
+        :param sheet_range: string specifying Google sheet range in A1 notation
+        :return: dictionary of sheet values in {"range": range, "values": rows} form
+        """
+
+        return self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id, range=sheet_range,
             valueRenderOption=self.value_render_option,
-            dateTimeRenderOption=self.date_time_render_option)
+            dateTimeRenderOption=self.date_time_render_option).execute()
 
-        # capture data from request
-        self.sheet_obj = self.request.execute()
+    def request_modified_time(self):
+        """
+        request modification time of spreadsheet from Drive metadata
+        :return: string of RFC 3339 modification time, None if unavailable, such as for tokens without drive scope
+        """
+
+        from googleapiclient import discovery
+        from googleapiclient.errors import HttpError
+
+        try:
+            drive = discovery.build('drive', 'v3', http=self.http)
+            return drive.files().get(fileId=self.spreadsheet_id, fields='modifiedTime').execute()['modifiedTime']
+        except HttpError:
+            return None
+
+    def sync_values(self):
+        """
+        update cached sheet values, assuming rows are mostly appended at bottom of sheet:
+            -unchanged modification time: no values requested
+            -last anchor_rows cached rows unchanged and rows appended after them: appended rows requested
+            -otherwise, or without cache: full sheet requested
+        modified sheet without appended rows was edited, so it is requested in full, edits of rows above
+        anchor_rows made together with appended rows are requested with next edit
+        :return: dictionary of sheet values in {"values": rows} form
+        """
+
+        # capture cache, ignoring cache of other sheet or of values rendered differently
+        cache = None
+        if os.path.isfile(self.cache_file_path):
+            with open(self.cache_file_path) as cache_file:
+                cache = json.load(cache_file)
+            if (cache['spreadsheet_id'], cache['sheet_range'], cache.get('value_render_option', 'FORMATTED_VALUE')) \
+                    != (self.spreadsheet_id, self.sheet_range, self.value_render_option):
+                cache = None
+        modified_time = self.request_modified_time()
+
+        # incremental requests need sheet rows numbered from A1, so ranges within sheets are requested in full
+        if cache is None or not cache['values'] or '!' in self.sheet_range:
+            rows = self.request_values(self.sheet_range).get('values', [])
+        elif modified_time is not None and modified_time == cache['modified_time']:
+            return {'values': cache['values']}
+        else:
+            # request last cached rows, as anchor of unedited rows, and rows appended after them
+            rows = cache['values']
+            high_water_mark = len(rows)
+            anchor_start = max(1, high_water_mark - self.anchor_rows + 1)
+            last_column = self.column_letter(len(rows[0]))
+            response = self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=['{0}!A{1}:{2}{3}'.format(self.sheet_range, anchor_start, last_column, high_water_mark),
+                        '{0}!A{1}:{2}'.format(self.sheet_range, high_water_mark + 1, last_column)],
+                valueRenderOption=self.value_render_option,
+                dateTimeRenderOption=self.date_time_render_option).execute()
+            (anchor, tail) = [value_range.get('values', []) for value_range in response['valueRanges']]
+            if tail and anchor == rows[anchor_start - 1:]:
+                rows = rows + tail
+            else:
+                rows = self.request_values(self.sheet_range).get('values', [])
+
+        # write cache to temporary file and replace cache atomically
+        temp_path = self.cache_file_path + '.tmp'
+        with open(temp_path, 'w') as cache_file:
+            json.dump({'spreadsheet_id': self.spreadsheet_id,
+                       'sheet_range': self.sheet_range,
+                       'value_render_option': self.value_render_option,
+                       'modified_time': modified_time,
+                       'values': rows}, cache_file)
+        os.replace(temp_path, self.cache_file_path)
+
+        return {'values': rows}
+
+    @staticmethod
+    def column_letter(columns):
+        """
+        :param columns: integer of column number, 1 for column A
+        :return: string of column letters in A1 notation
+        """
+
+        letters = ''
+        while columns:
+            (columns, remainder) = divmod(columns - 1, 26)
+            letters = chr(ord('A') + remainder) + letters
+
+        return letters
 
     def sheet2df(self, col_labels, index_label, index_type=str):
         """
         create and format dataFrame using sheet object
+        typed sheets are converted column by column in one pass over rows:
+            -datetime64 index from serial-number dates, days since 1899-12-30
+            -float64 columns, with empty and non-numeric cells as nan
         :param col_labels: list of strings of labels used to create dataFrame
         :param index_label: string of dataFrame index
         :param index_type: string of dataFrame index type
         :return: dataFrame formatted for general purposes
         """
 
+        import numpy as np
+        import pandas as pd
+
         # capture values from sheet_obj
         rows = self.sheet_obj['values']
         labels = rows[0]
         data = rows[1:]
 
         # create and format df
-        df = pd.DataFrame.from_records(data=data, columns=labels)
-        df = df[col_labels]
-        df[index_label] = df[index_label].astype(index_type)
-        df = df.set_index(index_label)
+        if not self.typed:
+            df = pd.DataFrame.from_records(data=data, columns=labels)
+            df = df[col_labels]
+            df[index_label] = df[index_label].astype(index_type)
+            df = df.set_index(index_label)
+            return df
+
+        # build float64 arrays directly from cells, rows omit trailing empty cells
+        columns = {}
+        for label in col_labels:
+            position = labels.index(label)
+            columns[label] = np.fromiter(
+                (row[position] if len(row) > position and isinstance(row[position], (int, float)) else np.nan
+                 for row in data), dtype=np.float64, count=len(data))
+
+        # convert serial-number dates to datetimes, rounded to seconds
+        index = columns.pop(index_label)
+        if np.dtype(index_type).kind == 'M':
+            seconds = np.rint(index * 24*60*60)
+            valid = ~np.isnan(seconds)
+            dates = np.full(len(index), np.datetime64('NaT'), dtype='datetime64[s]')
+            dates[valid] = np.datetime64('1899-12-30', 's') + seconds[valid].astype(np.int64)
+            index = dates.astype(index_type)
+        else:
+            index = index.astype(index_type)
 
-        return df
+        return pd.DataFrame(columns, index=pd.Index(index, name=index_label))
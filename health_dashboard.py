@@ -1,13 +1,21 @@
 import tkinter as tk
 from tkinter import ttk
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
-import matplotlib.pyplot as plt
-from IoTHealth.sleep import Sleep
-from IoTHealth.body_composition import BodyComposition
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
-plt.rcParams.update({'figure.autolayout': True})
+
+def import_pyplot():
+    """
+    select Tk backend and import pyplot on first use, keeping dashboard startup free of matplotlib
+    :return: matplotlib.pyplot module
+    """
+
+    import matplotlib
+    matplotlib.use("TkAgg")
+    import matplotlib.pyplot as plt
+    plt.rcParams.update({'figure.autolayout': True})
+
+    return plt
 
 
 class HealthDashboard(tk.Tk):
@@ -22,78 +30,382 @@ class HealthDashboard(tk.Tk):
         # setup gui parameters
         tk.Tk.__init__(self, *args, **kwargs)
         self.attributes("-fullscreen", True)
-        container = tk.Frame(self)
-        container.pack(side="top", fill="both", expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(0, weight=1)
+        self.container = tk.Frame(self)
+        self.container.pack(side="top", fill="both", expand=True)
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
         self.frames = {}
 
-        # append frames to frames dictionary
-        for F in (SleepMetrics, BodyMetrics):
-            frame = F(container, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        # initialize render parameters, sizing figures to screen below frame header and navigation toolbar
+        self.render_cache_dir = '/home/sosa/Documents/IoTHealth/render_cache'
+        header_height = 140
+        self.dpi = 100
+        self.figure_size = (self.winfo_screenwidth() / self.dpi,
+                            (self.winfo_screenheight() - header_height) / self.dpi)
 
-        # show startup frame
-        self.show_frame(SleepMetrics)
+        # initialize worker pool for data sync, passing results back through queue polled by main loop
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.results = queue.Queue()
+        self.poll_interval = 100
+        self.refresh_interval = 60*60*1000
+        self.poll_results()
+
+        # show startup frame once window is drawn
+        self.loading_label = tk.Label(self.container, text="Loading...", font=("verdana", 12))
+        self.loading_label.grid(row=0, column=0)
+        self.after(10, self.show_frame, SleepMetrics)
 
     def show_frame(self, cont):
         """
-        raises container to front
+        raises container to front, building frame on first request
         :param cont: container to be raised
         """
 
+        # build frame and append to frames dictionary on first request
+        if cont not in self.frames:
+            frame = cont(self.container, self)
+            self.frames[cont] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+
         frame = self.frames[cont]
         frame.tkraise()
 
+    def submit(self, task, callback, error_callback):
+        """
+        run task on worker thread and pass its result to callback on main thread
+        :param task: function run on worker thread
+        :param callback: function called on main thread with result of task
+        :param error_callback: function called on main thread with exception raised by task
+        """
+
+        future = self.executor.submit(task)
+        future.add_done_callback(lambda f: self.results.put((f, callback, error_callback)))
+
+    def poll_results(self):
+        """
+        pass results of finished tasks to their callbacks, rescheduling poll
+        poll is rescheduled first and exceptions raised by callbacks are passed to their error callbacks,
+        so a failed callback never stops polling
+        """
+
+        self.after(self.poll_interval, self.poll_results)
 
-class SleepMetrics(tk.Frame):
+        while True:
+            try:
+                (future, callback, error_callback) = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if future.exception() is not None:
+                    error_callback(future.exception())
+                else:
+                    callback(future.result())
+            except Exception as error:
+                error_callback(error)
+
+
+class MetricsFrame(tk.Frame):
     """
-    create frame displaying sleep metrics for last 15 days
+    create frame displaying rendered figure, syncing and preparing data on worker thread
     """
-    def __init__(self, parent, controller):
+
+    def __init__(self, parent, controller, title, button_text, button_frame, page):
         """
         initialize frame parameters
         :param parent: parent
         :param controller: controller
+        :param title: string of frame title
+        :param button_text: string of button text
+        :param button_frame: frame class raised by button
+        :param page: string of page name used by render cache
         """
 
         # setup container parameters
         tk.Frame.__init__(self, parent)
-        label = tk.Label(self, text="Sleep", font=("verdana", 12))
-        label.pack(pady=10, padx=10)
-
-        button1 = ttk.Button(self, text="Body Composition",
-                             command=lambda: controller.show_frame(BodyMetrics))
+        self.controller = controller
+        self.page = page
+        self.loading = False
+        self.title = title
+        self.title_label = tk.Label(self, text=title, font=("verdana", 12))
+        self.title_label.pack(pady=10, padx=10)
+        button1 = ttk.Button(self, text=button_text,
+                             command=lambda: controller.show_frame(button_frame))
         button1.pack()
 
+        # setup progress indicator and figure label
+        self.progress = ttk.Progressbar(self, mode='indeterminate')
+        self.progress.pack(fill=tk.X, padx=10)
+        self.image = None
+        self.image_label = tk.Label(self)
+        self.image_label.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        # initialize data shown, figure is kept on canvas once plotted and its artists updated in place
+        self.data = None
+        self.key = None
+        self.canvas = None
+        self.toolbar = None
+
+        # import plotting modules on main thread, before workers import plotting classes
+        self.plt = import_pyplot()
+        from IoTHealth.render_cache import RenderCache
+        self.render_cache = RenderCache(controller.render_cache_dir)
+
+        # show latest rendered figure while data syncs
+        latest_path = self.render_cache.latest(self.page)
+        if latest_path is not None:
+            self.show_image(latest_path)
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        sync and prepare data on worker thread, rescheduling periodic refresh
+        """
+
+        if not self.loading:
+            self.loading = True
+            self.progress.start()
+            self.controller.submit(self.capture_data, self.show_data, self.show_error)
+
+        self.after(self.controller.refresh_interval, self.refresh)
+
+    def capture_data(self):
+        """
+        sync data and create render cache key, run on worker thread
+        :return: tuple of (data object, render cache key) form
+        """
+
+        raise NotImplementedError
+
+    def plot_data(self, data):
+        """
+        plot data to its figure, run on main thread
+        :param data: data object returned by capture_data()
+        :return: figure object
+        """
+
+        raise NotImplementedError
+
+    def update_data(self, data):
+        """
+        update artists of plotted figure in place with synced data, run on main thread
+        :param data: data object returned by capture_data()
+        :return: list of axes updated
+        """
+
+        raise NotImplementedError
+
+    def show_data(self, result):
+        """
+        show figure of data, rendering figure only if data changed
+            -cached figure of unchanged data is shown as image, figure is plotted on canvas when image is clicked
+            -otherwise figure is plotted on canvas once, then changed axes are updated in place and blitted
+        :param result: tuple returned by capture_data()
+        """
+
+        (data, key) = result
+        if self.canvas is not None:
+            if key != self.key:
+                # capture extents of artists before update, so stale pixels are cleared
+                renderer = self.canvas.get_renderer()
+                extents = [(ax, ax.get_tightbbox(renderer)) for ax in self.canvas.figure.axes]
+                self.blit_axes(self.update_data(data), extents)
+                self.cache_canvas(key)
+        else:
+            image_path = self.render_cache.get(key)
+            if image_path is None:
+                self.show_canvas(self.plot_data(data))
+                self.cache_canvas(key)
+            else:
+                self.show_image(image_path)
+                self.image_label.configure(cursor='hand2')
+                self.image_label.bind('<Button-1>', self.show_live)
+
+        self.data = data
+        self.key = key
+        self.title_label.configure(text=self.title, fg='black')
+        self.stop_loading()
+
+    def show_live(self, event):
+        """
+        plot data shown as cached image on canvas, so it can be panned and zoomed
+        :param event: mouse click event on image
+        """
+
+        self.image_label.unbind('<Button-1>')
+        try:
+            self.show_canvas(self.plot_data(self.data))
+        except Exception as error:
+            self.show_error(error)
+
+    def show_canvas(self, figure):
+        """
+        embed figure in frame with navigation toolbar, replacing figure label
+        time axes can be panned and zoomed across full history, their plots refill visible data in place
+        :param figure: figure object
+        """
+
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from IoTHealth.navigation import BlitNavigationToolbar
+
+        self.image_label.pack_forget()
+        self.canvas = FigureCanvasTkAgg(figure, master=self)
+        self.toolbar = BlitNavigationToolbar(self.canvas, self, self.blit_axes)
+        self.toolbar.update()
+        self.toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.canvas.draw()
+
+    def blit_axes(self, axes, extents):
+        """
+        redraw updated axes onto canvas, leaving pixels of unchanged axes in place
+        :param axes: list of axes updated in place
+        :param extents: list of (axes, bbox) tuples of all axes captured before update
+        :return: list of (axes, bbox) tuples of all axes, bboxes of updated axes covering them before and after
+        """
+
+        from matplotlib.patches import Rectangle
+        from matplotlib.transforms import Bbox
+
+        if not axes:
+            return extents
+
+        # grow region until it covers every axes overlapping it, before and after update,
+        # measuring only updated axes, as others keep their extents
+        figure = self.canvas.figure
+        renderer = self.canvas.get_renderer()
+        redrawn = set(axes)
+        extents = [(ax, Bbox.union([bbox, ax.get_tightbbox(renderer)]) if ax in redrawn else bbox)
+                   for ax, bbox in extents]
+        region = Bbox.union([bbox for ax, bbox in extents if ax in redrawn])
+        while True:
+            overlapping = set(ax for ax, bbox in extents if bbox.overlaps(region))
+            if overlapping <= redrawn:
+                break
+            redrawn |= overlapping
+            region = Bbox.union([bbox for ax, bbox in extents if ax in redrawn])
+        region = Bbox.intersection(region, figure.bbox)
+
+        # clear region, then redraw axes and figure texts within it in figure draw order
+        background = Rectangle(region.p0, region.width, region.height, transform=None,
+                               facecolor=figure.get_facecolor(), edgecolor='none')
+        background.set_figure(figure)
+        figure.draw_artist(background)
+        for ax, bbox in extents:
+            if ax in redrawn:
+                figure.draw_artist(ax)
+        for text in figure.texts:
+            if text.get_window_extent(renderer).overlaps(region):
+                figure.draw_artist(text)
+
+        self.canvas.blit(region)
+
+        return extents
+
+    def cache_canvas(self, key):
+        """
+        store pixels already drawn on canvas in render cache, without rendering figure again
+        :param key: string of key from RenderCache.key()
+        """
+
+        if self.render_cache.get(key) is None:
+            self.render_cache.put_image(key, self.canvas.buffer_rgba(), self.page)
+
+    def show_error(self, error):
+        """
+        keep showing latest figure after failed sync or plot, reporting error in title until next shown data,
+        so stale figures are marked as stale
+        :param error: exception raised by capture_data() or by showing its data
+        """
+
+        self.title_label.configure(text=self.title + ' - data sync failed: ' + str(error), fg='red')
+        self.stop_loading()
+
+    def show_image(self, image_path):
+        """
+        :param image_path: string of absolute path to png
+        """
+
+        self.image = tk.PhotoImage(file=image_path)
+        self.image_label.configure(image=self.image, text='')
+
+    def stop_loading(self):
+        """
+        hide progress indicator and allow next refresh
+        """
+
+        self.loading = False
+        self.progress.stop()
+
+
+class SleepMetrics(MetricsFrame):
+    """
+    create frame displaying sleep metrics for last 15 days
+    """
+
+    def __init__(self, parent, controller):
+        """
+        initialize frame parameters
+        :param parent: parent
+        :param controller: controller
+        """
+
         # initialize Sleep object parameters
-        tokens_fp = '/home/sosa/Documents/IoTHealth/fitbit_tokens.txt'
-        sleep_logs_fp = '/home/sosa/Documents/IoTHealth/sleep.csv'
-        sleep_series_fp = '/home/sosa/Documents/IoTHealth/sleep_series.json'
-        grid_shape = (4, 15)
-        eff_plt_pos = (2, 0)
-        stages_plt_pos = (0, 0)
+        self.tokens_fp = '/home/sosa/Documents/IoTHealth/fitbit_tokens.txt'
+        self.sleep_logs_fp = '/home/sosa/Documents/IoTHealth/sleep.csv'
+        self.sleep_series_fp = '/home/sosa/Documents/IoTHealth/sleep_series'
+        self.store_fp = None
+        self.grid_shape = (4, 15)
+        self.eff_plt_pos = (2, 0)
+        self.stages_plt_pos = (0, 0)
+
+        MetricsFrame.__init__(self, parent, controller, "Sleep", "Body Composition", BodyMetrics, 'sleep')
+
+    def capture_data(self):
+        """
+        sync sleep data and create render cache key, run on worker thread
+        sleep data already plotted is synced in place, sync replaces whole attributes,
+        so plots panned on main thread during sync read either previous or synced data
+        :return: tuple of (Sleep object, render cache key) form
+        """
+
+        from IoTHealth.sleep import Sleep
 
         # capture sleep data
-        sleep = Sleep(sleep_logs_fp, sleep_series_fp, tokens_fp)
+        if self.data is None:
+            sleep = Sleep(self.sleep_logs_fp, self.sleep_series_fp, self.tokens_fp, self.store_fp)
+        else:
+            sleep = self.data
+            sleep.sync_local_stores()
+        key = self.render_cache.key('sleep', sleep.plot_inputs(15), self.grid_shape, self.eff_plt_pos,
+                                    self.stages_plt_pos, self.controller.figure_size, self.controller.dpi)
+
+        return sleep, key
+
+    def plot_data(self, sleep):
+        """
+        plot sleep data to class figure, run on main thread
+        :param sleep: Sleep object
+        :return: figure object
+        """
 
-        # plot data to class figure
-        sleep.plot_stages_percent(grid_shape, stages_plt_pos, rowspan=2, colspan=15)
-        sleep.plot_efficiency(grid_shape, eff_plt_pos, rowspan=1, colspan=15)
-        plt.tight_layout()
-        sleep.plot_polar_hypnograms(grid_shape)
+        return sleep.plot_page(self.controller.figure_size, self.grid_shape, self.stages_plt_pos, self.eff_plt_pos)
 
-        # embed plot into HealthDashboard gui
-        canvas = FigureCanvasTkAgg(sleep.sleep_fig, self)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+    def update_data(self, sleep):
+        """
+        update sleep plots in place, run on main thread
+        :param sleep: Sleep object
+        :return: list of axes updated
+        """
 
+        return sleep.update_plots()
 
-class BodyMetrics(tk.Frame):
+
+class BodyMetrics(MetricsFrame):
     """
     create frame displaying available body composition data
     """
+
     def __init__(self, parent, controller):
         """
         initialize frame parameters
@@ -101,41 +413,62 @@ class BodyMetrics(tk.Frame):
         :param controller: controller
         """
 
-        # setup container parameters
-        tk.Frame.__init__(self, parent)
-        label = tk.Label(self, text="Body Composition", font=("Verdana", 12))
-        label.pack(pady=10, padx=10)
-        button1 = ttk.Button(self, text="Sleep",
-                             command=lambda: controller.show_frame(SleepMetrics))
-        button1.pack()
-
         # initialize BodyComposition object parameters
-        spreadsheet_id = '136gvJHeQOirtmTendXnpb19Pa96Tit7Hkt8RR3N2pEI'
-        sheet_range = 'Sheet1'
-        col_labels = ['date_time', 'weight_lb', 'fat_%', 'water_%', 'bone_lb',
-                      'muscle_lb', 'BMI', 'fat_lb', 'bone_%', 'muscle_%']
-        index = 'date_time'
-        index_type = 'datetime64[ns]'
-        grid = (5, 2)
-
-        # plot data to class figure
-        body = BodyComposition(spreadsheet_id, sheet_range, col_labels, index, index_type)
-        body.plot_total_mass(grid, plot_position=(0, 0), column_span=2, figure=body.body_fig)
-        body.plot_muscle(grid, plot_position=(1, 0), column_span=2, figure=body.body_fig)
-        body.plot_fat(grid, plot_position=(2, 0), column_span=2, figure=body.body_fig)
-        body.plot_bone(grid, plot_position=(3, 0), column_span=2, figure=body.body_fig)
-        body.plot_water_percent(grid, plot_position=(4, 0), column_span=1, figure=body.body_fig)
-        body.plot_bmi(grid, plot_position=(4, 1), column_span=1, figure=body.body_fig)
-
-        # embed plot into HealthDashboard gui
-        canvas = FigureCanvasTkAgg(body.body_fig, self)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.spreadsheet_id = '136gvJHeQOirtmTendXnpb19Pa96Tit7Hkt8RR3N2pEI'
+        self.sheet_range = 'Sheet1'
+        self.col_labels = ['date_time', 'weight_lb', 'fat_%', 'water_%', 'bone_lb',
+                           'muscle_lb', 'BMI', 'fat_lb', 'bone_%', 'muscle_%']
+        self.index = 'date_time'
+        self.index_type = 'datetime64[ns]'
+        self.sheet_cache_fp = '/home/sosa/Documents/IoTHealth/body_sheet.json'
+        self.body_fp = '/home/sosa/Documents/IoTHealth/body.csv'
+        self.store_fp = None
+        self.grid = (5, 2)
+
+        MetricsFrame.__init__(self, parent, controller, "Body Composition", "Sleep", SleepMetrics, 'body')
+
+    def capture_data(self):
+        """
+        sync body composition data and create render cache key, run on worker thread
+        :return: tuple of (BodyComposition object, render cache key) form
+        """
+
+        from IoTHealth.body_composition import BodyComposition
+
+        # capture body composition data
+        if self.data is None:
+            body = BodyComposition(self.spreadsheet_id, self.sheet_range, self.col_labels,
+                                   self.index, self.index_type, self.sheet_cache_fp, self.body_fp, self.store_fp)
+        else:
+            body = self.data
+            body.sync()
+        key = self.render_cache.key('body', body.df, self.grid, self.controller.figure_size, self.controller.dpi)
+
+        return body, key
+
+    def plot_data(self, body):
+        """
+        plot body composition data to class figure, run on main thread
+        :param body: BodyComposition object
+        :return: figure object
+        """
+
+        return body.plot_page(self.controller.figure_size, self.grid)
+
+    def update_data(self, body):
+        """
+        update body composition plots in place, run on main thread
+        :param body: BodyComposition object
+        :return: list of axes updated
+        """
+
+        return body.update_plots()
 
 
 # draw gui
-app = HealthDashboard()
-app.mainloop()
+if __name__ == "__main__":
+    app = HealthDashboard()
+    app.mainloop()
 
 # TODO Dev
 """
@@ -151,8 +484,8 @@ app.mainloop()
     Future TODO
     
     1. Create Body() class with attributes:
-            a. write body.csv file if nonexistent
-            b. update body.csv
+            DONE a. write body.csv file if nonexistent
+            DONE b. update body.csv
             etc ...
             
     2. Create IotHealth() class with attributes:
@@ -0,0 +1,92 @@
+from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+
+
+class BlitNavigationToolbar(NavigationToolbar2Tk):
+    """
+    navigation toolbar redrawing only axes being panned while dragging,
+    so panning across long histories redraws one plot per mouse motion instead of whole figure
+        -motion events are coalesced, axes are panned to latest motion once per Tk idle loop,
+         so redrawing never lags behind mouse
+        -whole figure is drawn once when pan is released, as by NavigationToolbar2Tk
+    """
+    def __init__(self, canvas, window, blit_axes):
+        """
+        create toolbar, packed by caller
+        :param canvas: FigureCanvasTkAgg object
+        :param window: tk widget containing toolbar
+        :param blit_axes: function of (list of axes, list of (axes, bbox) tuples of all axes) redrawing axes
+                          onto canvas and returning list of (axes, bbox) tuples covering redrawn pixels
+        """
+
+        NavigationToolbar2Tk.__init__(self, canvas, window, pack_toolbar=False)
+        self.blit_axes = blit_axes
+        self.extents = None
+        self.pan_event = None
+        self.pending_pan = None
+
+    def press_pan(self, event):
+        """
+        start pan, capturing extents of all axes once, as axes not panned keep their extents while dragging
+        :param event: mouse button press event
+        """
+
+        NavigationToolbar2Tk.press_pan(self, event)
+        if self._pan_info is not None:
+            renderer = self.canvas.get_renderer()
+            self.extents = [(ax, ax.get_tightbbox(renderer)) for ax in self.canvas.figure.axes]
+
+    def drag_pan(self, event):
+        """
+        record latest motion, scheduling pan once per idle loop
+        :param event: mouse motion event
+        """
+
+        if event.buttons != {self._pan_info.button}:
+            self.release_pan(None)
+            return
+        self.pan_event = event
+        if self.pending_pan is None:
+            self.pending_pan = self.canvas.get_tk_widget().after_idle(self.blit_pan)
+
+    def pan_axes(self):
+        """
+        pan axes to latest motion, their xlim_changed callbacks refilling their artists
+        """
+
+        for ax in self._pan_info.axes:
+            ax.drag_pan(self._pan_info.button, self.pan_event.key, self.pan_event.x, self.pan_event.y)
+
+    def blit_pan(self):
+        """
+        pan axes to latest motion and blit them onto canvas
+        """
+
+        self.pending_pan = None
+        if self._pan_info is not None:
+            self.pan_axes()
+            self.extents = self.blit_axes(self._pan_info.axes, self.extents)
+
+    def release_pan(self, event):
+        """
+        end pan at latest motion, drawing whole figure once
+        :param event: mouse button release event
+        """
+
+        if self.pending_pan is not None:
+            self.canvas.get_tk_widget().after_cancel(self.pending_pan)
+            self.pending_pan = None
+            if self._pan_info is not None:
+                self.pan_axes()
+        NavigationToolbar2Tk.release_pan(self, event)
+        self.extents = None
+
+
+# EXAMPLE using BlitNavigationToolbar()
+"""
+# embed figure with toolbar in MetricsFrame, blitting panned axes with MetricsFrame.blit_axes()
+canvas = FigureCanvasTkAgg(figure, master=frame)
+toolbar = BlitNavigationToolbar(canvas, frame, frame.blit_axes)
+toolbar.update()
+toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+"""
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+
+class RenderCache(object):
+    """
+    content-addressed cache of rendered figures:
+        -figures stored as png files named by hash of plotted inputs and plot parameters
+        -least recently used files evicted beyond max_entries
+    """
+    def __init__(self, cache_dir, max_entries=16):
+        """
+        initialize cache directory
+        :param cache_dir: string of absolute path to cache directory
+        :param max_entries: integer of rendered figures kept in cache
+        """
+
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def key(cls, *parts):
+        """
+        hash plotted inputs and plot parameters
+        :param parts: dataFrames, series, arrays, lists or tuples of them, or objects with deterministic repr()
+        :return: string of hex digest
+        """
+
+        digest = hashlib.sha256()
+        cls.hash_parts(digest, parts)
+
+        return digest.hexdigest()
+
+    @classmethod
+    def hash_parts(cls, digest, parts):
+        """
+        update digest with each part, recursing into lists and tuples
+        :param digest: hashlib hash object
+        :param parts: iterable of parts accepted by key()
+        """
+
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                digest.update(b'[')
+                cls.hash_parts(digest, part)
+                digest.update(b']')
+            elif isinstance(part, (pd.DataFrame, pd.Series)):
+                digest.update(repr(part.shape).encode())
+                labels = tuple(part.columns) if isinstance(part, pd.DataFrame) else part.name
+                digest.update(repr(labels).encode())
+                digest.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+            elif isinstance(part, np.ndarray):
+                digest.update(repr((part.dtype.str, part.shape)).encode())
+                digest.update(np.ascontiguousarray(part).tobytes())
+            else:
+                digest.update(repr(part).encode())
+            digest.update(b'|')
+
+    def image_path(self, key):
+        """
+        :param key: string of key from key()
+        :return: string of absolute path to png of key
+        """
+
+        return os.path.join(self.cache_dir, key + '.png')
+
+    def get(self, key):
+        """
+        capture cached figure, marking it as recently used
+        :param key: string of key from key()
+        :return: string of absolute path to png, None if not cached
+        """
+
+        image_path = self.image_path(key)
+        if not os.path.isfile(image_path):
+            return None
+        os.utime(image_path)
+
+        return image_path
+
+    def put(self, key, figure, name=None):
+        """
+        rasterize figure into cache and evict least recently used figures
+        :param key: string of key from key()
+        :param figure: figure object
+        :param name: string of page name whose latest figure is recorded, optional
+        :return: string of absolute path to png
+        """
+
+        # rasterize figure to temporary file and publish atomically
+        image_path = self.image_path(key)
+        figure.savefig(image_path + '.tmp', format='png', dpi=figure.dpi)
+
+        return self.publish(key, name)
+
+    def put_image(self, key, rgba, name=None):
+        """
+        store pixels already rendered, such as canvas buffer, and evict least recently used figures
+        :param key: string of key from key()
+        :param rgba: array-like of (height, width, 4) uint8 pixels
+        :param name: string of page name whose latest figure is recorded, optional
+        :return: string of absolute path to png
+        """
+
+        from matplotlib.image import imsave
+
+        imsave(self.image_path(key) + '.tmp', np.asarray(rgba), format='png')
+
+        return self.publish(key, name)
+
+    def publish(self, key, name=None):
+        """
+        atomically replace png of key with its temporary file and evict least recently used figures
+        :param key: string of key from key()
+        :param name: string of page name whose latest figure is recorded, optional
+        :return: string of absolute path to png
+        """
+
+        image_path = self.image_path(key)
+        os.replace(image_path + '.tmp', image_path)
+
+        # record latest key of page
+        if name is not None:
+            with open(os.path.join(self.cache_dir, name + '.latest'), 'w') as latest_file:
+                latest_file.write(key)
+
+        self.evict()
+
+        return image_path
+
+    def latest(self, name):
+        """
+        capture latest figure rendered for page, regardless of current data
+        :param name: string of page name passed to put()
+        :return: string of absolute path to png, None if not cached
+        """
+
+        latest_path = os.path.join(self.cache_dir, name + '.latest')
+        if not os.path.isfile(latest_path):
+            return None
+        with open(latest_path) as latest_file:
+            return self.get(latest_file.read().strip())
+
+    def evict(self):
+        """
+        remove least recently used figures beyond max_entries
+        """
+
+        images = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.png')]
+        images.sort(key=os.path.getmtime, reverse=True)
+        for image_path in images[self.max_entries:]:
+            os.remove(image_path)
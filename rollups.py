@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+
+# tiers from finest to coarsest, as (name, pandas frequency), periods labelled by their first day
+TIERS = [('day', 'D'), ('week', 'W-MON'), ('month', 'MS')]
+STATISTICS = ['mean', 'median', 'min', 'max', 'count']
+
+
+def lttb(x, y, threshold):
+    """
+    downsample line with largest-triangle-three-buckets, keeping points that preserve its visual shape
+    first and last points are always kept, inner points are split into threshold-2 buckets
+    and each bucket keeps the point forming largest triangle with previous kept point and mean of next bucket
+    :param x: array of increasing floats of x values
+    :param y: array of floats of y values, without nan
+    :param threshold: integer of points kept
+    :return: array of integer indices of kept points
+    """
+
+    # initialize parameters
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+
+    # keep point of largest triangle in each bucket
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x = x[-1]
+            next_y = y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+
+    return kept
+
+
+def view_range(ax):
+    """
+    :param ax: axes object with date x-axis
+    :return: tuple of (start, end) timestamps of visible x-axis, floored to seconds so they compare
+             with second-resolution indexes
+    """
+
+    from matplotlib.dates import get_epoch
+
+    epoch = pd.Timestamp(get_epoch())
+    (x_min, x_max) = sorted(ax.get_xlim())
+
+    return (epoch + pd.Timedelta(days=x_min)).floor('s'), (epoch + pd.Timedelta(days=x_max)).floor('s')
+
+
+class Rollups(object):
+    """
+    precomputed rollup tiers of daily dataFrame, for plotting long histories at level of detail of span:
+        -day tier is daily dataFrame itself
+        -week and month tiers hold mean, median, min, max and count of each column per period,
+         as columns of (column, statistic) form
+    """
+    def __init__(self, daily):
+        """
+        aggregate daily dataFrame into each tier in one pass per tier
+        :param daily: dataFrame of daily values with datetime index
+        """
+
+        self.daily = daily
+        self.tiers = self.aggregate(daily)
+
+    @staticmethod
+    def aggregate(daily):
+        """
+        :param daily: dataFrame of daily values with datetime index
+        :return: dictionary of dataFrames of each tier, keyed by tier name
+        """
+
+        tiers = {'day': daily}
+        for name, frequency in TIERS[1:]:
+            tiers[name] = daily.resample(frequency, closed='left', label='left').agg(STATISTICS)
+
+        return tiers
+
+    @staticmethod
+    def period_ends(name, index):
+        """
+        :param name: string of tier name
+        :param index: datetime index of period starts of tier
+        :return: datetime index of exclusive period ends
+        """
+
+        return index + to_offset(dict(TIERS)[name])
+
+    def window(self, name, start, end):
+        """
+        capture periods of tier overlapping dates from start to end, by binary search of sorted index
+        :param name: string of tier name
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :return: dataFrame of tier rows
+        """
+
+        frame = self.tiers[name]
+        first = max(frame.index.searchsorted(start, side='right') - 1, 0)
+        if first < len(frame) and frame.index[first] + to_offset(dict(TIERS)[name]) <= pd.Timestamp(start):
+            first += 1
+        last = frame.index.searchsorted(end, side='right')
+
+        return frame.iloc[first:max(first, last)]
+
+    def select(self, start, end, max_points):
+        """
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :param max_points: integer of points plotted at most
+        :return: string of finest tier name with at most max_points periods from start to end,
+                 coarsest tier if none fit
+        """
+
+        for name, frequency in TIERS:
+            if len(self.window(name, start, end)) <= max_points:
+                return name
+
+        return TIERS[-1][0]
+
+    def centres(self, name, index):
+        """
+        :param name: string of tier name
+        :param index: datetime index of period starts of tier
+        :return: datetime index of period centres, unchanged for day tier
+        """
+
+        if name == 'day':
+            return index
+
+        return index + (self.period_ends(name, index) - index) / 2
+
+    def period_days(self, name, index):
+        """
+        :param name: string of tier name
+        :param index: datetime index of period starts of tier
+        :return: array of floats of days in each period
+        """
+
+        return ((self.period_ends(name, index) - index) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+
+    def line(self, column, start, end, max_points):
+        """
+        capture line of column from start to end at level of detail of span
+        daily values are kept when span fits max_points, otherwise daily values are downsampled by lttb()
+        to as many points as periods of selected tier
+        daily values are indexed by binary search, so panned views are captured in time of window, not of history
+        :param column: string of column label
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :param max_points: integer of points plotted at most
+        :return: tuple of (datetime index, array of values) form
+        """
+
+        # capture daily values from start to end, with neighbouring value on each side, so lines reach view edges
+        values = self.daily[column]
+        first = max(values.index.searchsorted(start, side='left') - 1, 0)
+        last = values.index.searchsorted(end, side='right') + 1
+        values = values.iloc[first:last]
+        name = self.select(start, end, max_points)
+        if name == 'day':
+            return values.index, values.to_numpy(dtype=float)
+
+        values = values.dropna()
+        kept = lttb(values.index.asi8, values.to_numpy(dtype=float), len(self.window(name, start, end)))
+
+        return values.index[kept], values.to_numpy(dtype=float)[kept]
+
+    def band(self, column, start, end, max_points):
+        """
+        capture range of column per period of tier selected for span, shown behind downsampled lines
+        :param column: string of column label
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :param max_points: integer of points plotted at most
+        :return: tuple of (datetime index of period centres, array of minimums, array of maximums) form,
+                 None when daily values are plotted
+        """
+
+        name = self.select(start, end, max_points)
+        if name == 'day':
+            return None
+        window = self.window(name, start, end)[column]
+
+        return (self.centres(name, window.index),
+                window['min'].to_numpy(dtype=float), window['max'].to_numpy(dtype=float))
+
+
+class WindowRollups(Rollups):
+    """
+    rollup tiers of daily values read from store by date range on demand, for histories not held in memory:
+        -daily values are read for periods of every tier overlapping view, padded by span of view on each side,
+         so pans within padding reuse values already read
+        -tiers are aggregated from values read, complete periods aggregate as in Rollups
+    """
+    def __init__(self, read_range):
+        """
+        initialize rollups, no values are read until first window
+        :param read_range: function of (first date, last date) returning dataFrame of daily values with datetime index
+                           from first to last date, with neighbouring row on each side
+        """
+
+        self.read_range = read_range
+        self.span = None
+        self.daily = None
+        self.tiers = None
+
+    def load(self, start, end):
+        """
+        read and aggregate daily values covering view, unless covered by values already read
+        :param start: datetime of first date
+        :param end: datetime of last date
+        """
+
+        # capture first and last day of periods overlapping view, in each tier
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        offsets = [to_offset(frequency) for name, frequency in TIERS]
+        first = min(offset.rollback(start - pd.Timedelta(days=1)) for offset in offsets)
+        last = max(offset.rollback(end) + offset for offset in offsets) - pd.Timedelta(days=1)
+
+        # read padded span of periods
+        if self.span is None or first < self.span[0] or last > self.span[1]:
+            pad = end - start
+            first = min(offset.rollback(first - pad) for offset in offsets)
+            last = max(offset.rollback(last + pad) + offset for offset in offsets) - pd.Timedelta(days=1)
+            self.daily = self.read_range(first, last)
+            self.tiers = self.aggregate(self.daily)
+            self.span = (first, last)
+
+    def window(self, name, start, end):
+        """
+        capture periods of tier overlapping dates from start to end, reading them from store when not read yet
+        :param name: string of tier name
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :return: dataFrame of tier rows
+        """
+
+        self.load(start, end)
+
+        return Rollups.window(self, name, start, end)
+
+    def line(self, column, start, end, max_points):
+        """
+        capture line of column from start to end at level of detail of span, as Rollups.line()
+        :param column: string of column label
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :param max_points: integer of points plotted at most
+        :return: tuple of (datetime index, array of values) form
+        """
+
+        self.load(start, end)
+
+        return Rollups.line(self, column, start, end, max_points)
+
+
+# EXAMPLE using Rollups()
+"""
+# initialize parameters
+days = pd.date_range('2014-01-01', '2018-12-31', freq='D')
+daily = pd.DataFrame({'weight_lb': 180 + np.random.randn(len(days)).cumsum() / 10}, index=days)
+
+# capture 5 years of daily values at weekly level of detail
+rollups = Rollups(daily)
+print(rollups.select(days[0], days[-1], max_points=400))
+dates, values = rollups.line('weight_lb', days[0], days[-1], max_points=400)
+print(len(dates))
+"""
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+class RunningStatistics(object):
+    """
+    mergeable histogram sketch of bounded values:
+        -update with new values only
+        -count, mean, median and percentiles in constant time
+    values are binned at resolution, so quantiles are exact for values rounded to resolution
+    """
+    def __init__(self, lower=0.0, upper=100.0, resolution=0.1):
+        """
+        initialize empty sketch
+        :param lower: float of lowest value binned
+        :param upper: float of highest value binned
+        :param resolution: float of bin width
+        """
+
+        self.lower = lower
+        self.upper = upper
+        self.resolution = resolution
+        self.counts = np.zeros(int(round((upper - lower) / resolution)) + 1, dtype=np.int64)
+        self.total = 0.0
+
+    def update(self, values):
+        """
+        add values to sketch, ignoring nan and clipping values outside [lower, upper]
+        :param values: array-like of floats
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        values = np.clip(values[~np.isnan(values)], self.lower, self.upper)
+        bins = np.rint((values - self.lower) / self.resolution).astype(np.int64)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.total += float(values.sum())
+
+    def merge(self, other):
+        """
+        add counts of other sketch with equal bins
+        :param other: RunningStatistics
+        """
+
+        self.counts += other.counts
+        self.total += other.total
+
+    @property
+    def count(self):
+        """
+        :return: integer of values added
+        """
+
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        """
+        :return: float of mean value, nan if empty
+        """
+
+        return self.total / self.count if self.count else float('nan')
+
+    @property
+    def median(self):
+        """
+        :return: float of median value, nan if empty
+        """
+
+        return self.percentile(50)
+
+    def percentile(self, q):
+        """
+        compute percentile using linear interpolation between ranks, as numpy.percentile
+        :param q: float of percentile in [0, 100]
+        :return: float of percentile value, nan if empty
+        """
+
+        count = self.count
+        if not count:
+            return float('nan')
+
+        # capture values at ranks surrounding percentile position
+        position = q / 100 * (count - 1)
+        cumulative = np.cumsum(self.counts)
+        lower_rank, upper_rank = int(np.floor(position)), int(np.ceil(position))
+        lower_value, upper_value = self.lower + self.resolution * np.searchsorted(
+            cumulative, [lower_rank, upper_rank], side='right')
+
+        return float(lower_value + (upper_value - lower_value) * (position - lower_rank))
+
+    def to_dict(self):
+        """
+        :return: dictionary of sketch in json form, storing non-zero bins only
+        """
+
+        bins = np.flatnonzero(self.counts)
+
+        return {'lower': self.lower,
+                'upper': self.upper,
+                'resolution': self.resolution,
+                'total': self.total,
+                'counts': {str(b): int(self.counts[b]) for b in bins}}
+
+    @classmethod
+    def from_dict(cls, sketch):
+        """
+        :param sketch: dictionary of sketch in json form from to_dict()
+        :return: RunningStatistics
+        """
+
+        stats = cls(sketch['lower'], sketch['upper'], sketch['resolution'])
+        stats.total = sketch['total']
+        for b, count in sketch['counts'].items():
+            stats.counts[int(b)] = count
+
+        return stats
@@ -1,4 +1,9 @@
 from IoTHealth.fitbit import Fitbit
+from IoTHealth.csv_store import append_csv, write_csv, repair_csv_tail
+from IoTHealth.sleep_series import SleepSeries, STAGE_CODES, SHORT_WAKE_CODE
+from IoTHealth.running_stats import RunningStatistics
+from IoTHealth.rollups import Rollups, WindowRollups, view_range
+from IoTHealth.sqlite_store import SQLiteStore
 from datetime import datetime as dt
 from datetime import time
 from datetime import timedelta
@@ -7,188 +12,440 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import date2num
+from matplotlib.collections import PathCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import Patch
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.ticker import FixedLocator
+from matplotlib.transforms import Affine2D, Bbox, TransformedBbox
 import numpy as np
-import numpy.ma as ma
 from numpy import pi
 import json
-import copy
 from math import isnan
+from functools import lru_cache
 
 
-def time2radian(time_list):
+@lru_cache(maxsize=512)
+def text_path(label, fontsize, fontweight):
     """
-    convert datetimes to radians
-    :param time_list: list of date_times or seconds strings
-    :return: list of radians
+    convert label to text path centred horizontally on origin, with baseline at origin
+    :param label: string of text
+    :param fontsize: float of font size in points
+    :param fontweight: string of font weight
+    :return: path in points
+    """
+
+    path = TextPath((0, 0), label, prop=FontProperties(size=fontsize, weight=fontweight))
+    extents = path.get_extents()
+
+    return path.transformed(Affine2D().translate(-(extents.x0 + extents.x1)/2, 0))
+
+
+def time2radian(times):
+    """
+    convert datetimes or durations to radians in one vectorized pass
+    :param times: array-like of ISO date_time strings, datetime64 values, or seconds
+    :return: numpy array of radians
     """
 
     # initialize parameters
-    minutes_per_day = 24*60
     seconds_per_day = 24*60*60
-    radians = []
-
-    # calculate and append radians for seconds, minutes, and hours
-    for time in time_list:
-        if isinstance(time, (str,)):
-            time = dt.strptime(time[:10] + ' ' + time[11:], "%Y-%m-%d %H:%M:%S.%f")
-            proportion_of_day = time.hour/24
-            proportion_of_day += time.minute/minutes_per_day
-            proportion_of_day += time.second/seconds_per_day
-            radian = 2*pi*proportion_of_day
-            radians.append(radian)
-        else:
-            proportion_of_day = time/seconds_per_day
-            radian = 2*pi*proportion_of_day
-            radians.append(radian)
+    times = np.asarray(times)
 
-    return radians
+    # capture seconds elapsed since midnight for date_times, else treat values as seconds
+    if times.dtype.kind in ('U', 'S', 'M'):
+        times = times.astype('datetime64[s]')
+        seconds = (times - times.astype('datetime64[D]')).astype(np.int64)
+    else:
+        seconds = times.astype(np.float64)
+
+    return 2*pi*seconds/seconds_per_day
 
 
 class Sleep(object):
     """
     interact with sleep logs
     """
-    def __init__(self, sleep_file_path, sleep_series_file_path, tokens_file_path):
+    def __init__(self, sleep_file_path, sleep_series_file_path, tokens_file_path, store_file_path=None):
         """
-        create and/or update sleep.csv
-        capture sleep_logs using instance variable
+        create and/or update sleep.csv and sleep_series store, or SQLite store when given
+        capture sleep_logs and sleep_series using instance variables
         :param sleep_file_path: string of absolute file-path to sleep.csv
+        :param sleep_series_file_path: string of absolute path to sleep_series directory
         :param tokens_file_path: string of absolute file-path to fitbit_tokens.txt
+        :param store_file_path: string of absolute file-path to SQLite store, optional
+                                replaces sleep.csv and sleep_series store, which are imported into empty store
         """
 
         # initialize data attributes
         self.sleep_file_path = sleep_file_path
         self.sleep_series_file_path = sleep_series_file_path
+        self.stats_file_path = os.path.splitext(sleep_file_path)[0] + '_stats.json'
         self.tokens_file_path = tokens_file_path
+        self.first_date = "2018-08-07"
+        self.store = SQLiteStore(store_file_path) if store_file_path is not None else None
+        self.recent_nights = 31
+
+        # initialize plot attributes, figure is created on first plot and artists kept for in-place updates
+        self.figure = None
+        self.stages_artists = None
+        self.efficiency_artists = None
+        self.hypnogram_artists = None
+        self.max_bar_groups = 92
+        self.tick_formats = {'day': '%a-%b-%d', 'week': '%b-%d-%y', 'month': '%b-%y'}
+
+        # migrate legacy sleep_series.json to columnar store
+        legacy_json_path = os.path.splitext(self.sleep_series_file_path)[0] + '.json'
+        if not os.path.isdir(self.sleep_series_file_path) and os.path.isfile(legacy_json_path):
+            with open(legacy_json_path) as series_file:
+                SleepSeries.from_json(json.load(series_file)).save(self.sleep_series_file_path)
+
+        # import local stores into empty SQLite store
+        if self.store is not None and not self.store.count('sleep_logs') and os.path.isfile(self.sleep_file_path) \
+                and os.path.isdir(self.sleep_series_file_path):
+            self.import_local_stores()
+
+        # capture up-to-date sleep logs and sleep time series
+        self.sync_local_stores()
+
+    def sync_local_stores(self):
+        """
+        request missing sleep logs from Fitbit once and update SQLite store or local stores with them
+        called again on long-running instances to refresh data before update_plots()
+        """
+
+        # update stores
         self.today = dt.today().strftime("%Y-%m-%d")
+        self.logs_revised = False
+        if self.store is not None:
+            self.sync_store()
+        else:
+            self.sync_files()
 
-        # initialize plot attributes
-        self.sleep_fig = plt.figure(dpi=100)
-        plt.rc("xtick", labelsize=18)
-        plt.rc("ytick", labelsize=18)
+        # index nightly durations by dateOfSleep for hypnogram lookups
+        self.night_durations = dict(zip(self.sleep_logs.index.strftime("%Y-%m-%d"),
+                                        self.sleep_logs["duration"].values))
 
-        # capture up-to-date sleep logs
-        if os.path.isfile(self.sleep_file_path) and os.access(self.sleep_file_path, os.R_OK):
-            self.sleep_logs = self.update_local_logs()
+        # update lifetime statistics with newly ingested nights
+        self.stage_statistics = self.update_stage_statistics()
+
+        # precompute weekly and monthly rollups of nightly stage percentages, efficiency and duration,
+        # or aggregate them per view from SQLite store
+        if self.store is not None:
+            self.rollups = WindowRollups(self.read_nightly)
         else:
-            self.sleep_logs = self.initialize_csv()
+            self.rollups = Rollups(self.nightly_percentages(self.sleep_logs))
+
+    def sync_files(self):
+        """
+        pass missing sleep logs to both sleep.csv and sleep_series store, each store updating from its own latest
+        local date
+        """
 
-        # capture up-to-date sleep time series
-        if os.path.isfile(sleep_series_file_path) and os.access(self.sleep_series_file_path, os.R_OK):
-            self.sleep_series = self.update_local_series()
+        # capture local stores, if available
+        local_logs = None
+        local_series = None
+        if os.path.isfile(self.sleep_file_path) and os.access(self.sleep_file_path, os.R_OK):
+            repair_csv_tail(self.sleep_file_path)
+            local_logs = pd.read_csv(self.sleep_file_path, index_col="dateOfSleep", parse_dates=True)
+        if os.path.isdir(self.sleep_series_file_path) and os.access(self.sleep_series_file_path, os.R_OK):
+            local_series = SleepSeries.load(self.sleep_series_file_path)
+
+        # capture date ranges missing from each store
+        logs_range = (self.next_date(local_logs.index.max().strftime("%Y-%m-%d"))
+                      if local_logs is not None else self.first_date,
+                      self.today)
+        series_range = (self.next_date(local_series.latest_date) if local_series is not None else self.first_date,
+                        self.today)
+
+        # request logs missing from either store once
+        fetch_start = min(logs_range[0], series_range[0])
+        if fetch_start <= self.today:
+            fitbit = Fitbit(self.tokens_file_path)
+            raw_logs = fitbit.sleep_logs_range((fetch_start, self.today))
+        else:
+            raw_logs = {"sleep": []}
+
+        # clip ranges to newest logged night, so nights not logged yet are requested again by next sync
+        # instead of being stored as missing nights
+        logged_logs_range = self.logged_range(raw_logs, logs_range)
+        logged_series_range = self.logged_range(raw_logs, series_range)
+
+        # update sleep_logs and sleep.csv
+        if local_logs is None:
+            self.sleep_logs = self.initialize_csv(raw_logs, logged_logs_range or logs_range)
+        elif logged_logs_range is None:
+            self.sleep_logs = local_logs
         else:
-            self.sleep_series = self.initialize_json()
+            self.sleep_logs = self.update_local_logs(local_logs, self.filter_raw_logs(raw_logs, logged_logs_range),
+                                                     logged_logs_range)
+
+        # update sleep_series and sleep_series store
+        if local_series is None:
+            self.sleep_series = self.initialize_series(raw_logs, logged_series_range or series_range)
+        elif logged_series_range is None:
+            self.sleep_series = local_series
+        else:
+            self.sleep_series = self.update_local_series(local_series,
+                                                         self.filter_raw_logs(raw_logs, logged_series_range),
+                                                         logged_series_range)
+
+    def sync_store(self):
+        """
+        upsert nightly summaries and epochs of nights missing from SQLite store, requested from Fitbit once
+        only recent_nights are read into sleep_logs and sleep_series, older nights are read by date range
+        """
+
+        # request nights after latest stored night
+        latest = self.store.bounds('sleep_logs')[1]
+        date_range = (self.next_date(latest.strftime("%Y-%m-%d")) if latest is not None else self.first_date,
+                      self.today)
+        if date_range[0] <= self.today:
+            fitbit = Fitbit(self.tokens_file_path)
+            raw_logs = fitbit.sleep_logs_range(date_range)
+
+            # clip range to newest logged night, so nights not logged yet are requested again by next sync
+            # instead of being stored as missing nights, empty store is still initialized over whole range
+            logged_range = self.logged_range(raw_logs, date_range)
+            if logged_range is not None or latest is None:
+                date_range = logged_range or date_range
+                raw_logs = self.filter_raw_logs(raw_logs, date_range)
+
+                # upsert epochs before nightly summaries, as stored summaries mark nights synced
+                self.store.write_series(self.capture_series_data(raw_logs, date_range))
+                self.store.upsert('sleep_logs', self.capture_log_data(raw_logs, date_range))
+
+        # read recent nights
+        latest = self.store.bounds('sleep_logs')[1]
+        self.sleep_logs = self.store.read('sleep_logs', start=latest - timedelta(days=self.recent_nights - 1))
+        self.sleep_series = self.store.read_series(self.sleep_logs.index[0], latest)
+
+    def import_local_stores(self):
+        """
+        import sleep.csv and sleep_series store into SQLite store, through latest night of both,
+        so nights missing from either store are requested from Fitbit by sync_store()
+        """
+
+        # capture local stores
+        repair_csv_tail(self.sleep_file_path)
+        local_logs = pd.read_csv(self.sleep_file_path, index_col="dateOfSleep", parse_dates=True)
+        local_series = SleepSeries.load(self.sleep_series_file_path)
+        latest_date = min(local_logs.index.max().strftime("%Y-%m-%d"), local_series.latest_date)
+
+        # upsert epochs before nightly summaries, as stored summaries mark nights synced
+        self.store.write_series(local_series.between(local_logs.index.min().strftime("%Y-%m-%d"), latest_date))
+        self.store.upsert('sleep_logs', local_logs.loc[:latest_date])
+
+    def read_logs(self, start=None):
+        """
+        :param start: string of first dateOfSleep (YYYY-mm-dd format), default reads from first night
+        :return: dataFrame of sleep logs from start, read from SQLite store when given
+        """
+
+        if self.store is not None:
+            return self.store.read('sleep_logs', start=start)
 
-    def update_local_logs(self):
+        return self.sleep_logs.loc[start:]
+
+    def read_nightly(self, first, last):
+        """
+        read nightly percentages from SQLite store by date range, used by WindowRollups
+        :param first: datetime of first dateOfSleep
+        :param last: datetime of last dateOfSleep
+        :return: dataFrame of nightly percentages from first to last, with neighbouring night on each side
+        """
+
+        return self.nightly_percentages(self.store.read('sleep_logs', first, last, neighbours=True))
+
+    @staticmethod
+    def nightly_percentages(sleep_logs):
+        """
+        :param sleep_logs: dataFrame of sleep logs
+        :return: dataFrame of stage percentages, efficiency and duration of each night, indexed by dateOfSleep
+        """
+
+        stages = ['wake', 'rem', 'light', 'deep']
+        durations = sleep_logs['duration'].values[:, None]
+        nightly = pd.DataFrame(np.around(sleep_logs[stages].values / durations, 3) * 100,
+                               index=sleep_logs.index, columns=stages)
+        nightly['efficiency'] = sleep_logs['efficiency']
+        nightly['duration'] = sleep_logs['duration']
+
+        return nightly
+
+    @staticmethod
+    def next_date(date):
+        """
+        :param date: string of date (YYYY-mm-dd format)
+        :return: string of following date (YYYY-mm-dd format)
+        """
+
+        return (dt.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def filter_raw_logs(sleep_raw_logs, date_range):
+        """
+        capture raw logs within date range
+        :param sleep_raw_logs: json object of raw sleep data from Fitbit request
+        :param date_range: tuple of (start_date, end_date) form
+        :return: json object of raw sleep data within date_range
+        """
+
+        return {"sleep": [raw_log for raw_log in sleep_raw_logs["sleep"]
+                          if date_range[0] <= raw_log["dateOfSleep"] <= date_range[1]]}
+
+    @staticmethod
+    def logged_range(sleep_raw_logs, date_range):
+        """
+        clip date range to newest main sleep log within it
+        :param sleep_raw_logs: json object of raw sleep data from Fitbit request
+        :param date_range: tuple of (start_date, end_date) form
+        :return: tuple of (start_date, newest dateOfSleep) form, None if no main sleep log within date_range
+        """
+
+        dates = [raw_log["dateOfSleep"] for raw_log in sleep_raw_logs["sleep"]
+                 if raw_log.get("isMainSleep", True) and date_range[0] <= raw_log["dateOfSleep"] <= date_range[1]]
+        if not dates:
+            return None
+
+        return date_range[0], max(dates)
+
+    @property
+    def sleep_fig(self):
+        """
+        create figure on first access, so sleep data can be captured off the main thread
+        :return: figure object of sleep plots
+        """
+
+        if self.figure is None:
+            self.figure = plt.figure(dpi=100)
+            plt.rc("xtick", labelsize=18)
+            plt.rc("ytick", labelsize=18)
+
+        return self.figure
+
+    def update_local_logs(self, local_logs, raw_logs, date_range):
         """
         update sleep.csv and sleep_logs
+        :param local_logs: dataFrame of sleep logs read from sleep.csv
+        :param raw_logs: json object of raw sleep data missing from sleep.csv
+        :param date_range: tuple of (start_date, end_date) form missing from sleep.csv
         :return: up-to-date sleep_logs
         """
 
-        # read sleep.csv and capture data
-        local_logs = pd.read_csv(self.sleep_file_path)
-        local_logs = local_logs.set_index("dateOfSleep")
-        latest_date_local = local_logs.index.max()
-
-        # update sleep_logs, depending on latest local entry
-        if latest_date_local == self.today:
+        # update sleep_logs and sleep.csv, depending on logs returned from Fitbit
+        if not raw_logs['sleep']:
             sleep_logs = local_logs
         else:
-            # request missing logs from Fitbit
-            latest_date_local = dt.strptime(latest_date_local, "%Y-%m-%d")
-            next_date_local = (latest_date_local + timedelta(days=1)).strftime("%Y-%m-%d")
-            date_range = (next_date_local, self.today)
-            fitbit = Fitbit(self.tokens_file_path)
-            raw_logs = fitbit.sleep_logs_range(date_range)
-
-            # update sleep_logs and sleep.csv, depending on logs returned from Fitbit
-            if not raw_logs['sleep']:
-                sleep_logs = local_logs
+            # capture explicit data from raw logs
+            api_logs = self.capture_log_data(raw_logs, date_range)
+            revised = api_logs.index.isin(local_logs.index)
+
+            # update sleep.csv, appending new rows or compacting file when local rows are revised
+            if revised.any():
+                self.logs_revised = True
+                frames = [local_logs.drop(api_logs.index[revised]), api_logs]
+                sleep_logs = pd.concat(frames).sort_index()
+                write_csv(sleep_logs, self.sleep_file_path)
             else:
-                # capture explicit data from raw logs and append to local_logs
-                api_logs = self.capture_log_data(raw_logs, date_range)
                 frames = [local_logs, api_logs]
                 sleep_logs = pd.concat(frames)
-
-                # update sleep.csv
-                sleep_logs.to_csv(path_or_buf=self.sleep_file_path, mode='w')
-        sleep_logs.index = pd.to_datetime(sleep_logs.index)
+                append_csv(api_logs, self.sleep_file_path)
 
         return sleep_logs
 
-    def update_local_series(self):
+    def update_local_series(self, local_series, raw_logs, date_range):
         """
-        update sleep_series.json and sleep_series
+        update sleep_series store and sleep_series
+        :param local_series: SleepSeries memory-mapped from sleep_series store
+        :param raw_logs: json object of raw sleep data missing from sleep_series store
+        :param date_range: tuple of (start_date, end_date) form missing from sleep_series store
         :return: up-to-date sleep_series
         """
 
-        # read sleep_series.json and capture data
-        with open(self.sleep_series_file_path) as series_file:
-            local_series = json.load(series_file)
+        # update sleep_series and sleep_series store, depending on logs returned from Fitbit
+        if not raw_logs["sleep"]:
+            sleep_series = local_series
+        else:
+            # capture series data from raw logs and append nights to sleep_series store
+            api_series = self.capture_series_data(raw_logs, date_range)
+            api_series.append_to(self.sleep_series_file_path)
 
-        latest_date_local = local_series["sleep"][-1]["dateOfSleep"]
+            # memory-map up-to-date sleep_series
+            sleep_series = SleepSeries.load(self.sleep_series_file_path)
 
-        # update sleep_series, depending on latest local entry
-        if latest_date_local == self.today:
-            sleep_series = local_series
+        return sleep_series
+
+    def update_stage_statistics(self):
+        """
+        update persisted lifetime statistics of stage percentages with nights ingested since last update
+        statistics are rebuilt from sleep_logs when missing, stale, or when rows of sleep.csv were revised
+        :return: dictionary of RunningStatistics of stage percentages, keyed by stage
+        """
+
+        # initialize parameters
+        stages = ['wake', 'rem', 'light', 'deep']
+        latest_date = self.sleep_logs.index.max().strftime("%Y-%m-%d")
+        stats_json = None
+
+        # read persisted statistics, if available
+        if os.path.isfile(self.stats_file_path) and not self.logs_revised:
+            with open(self.stats_file_path) as stats_file:
+                stats_json = json.load(stats_file)
+            if stats_json["through"] > latest_date:
+                stats_json = None
+
+        # capture nights missing from statistics
+        if stats_json is None:
+            stage_statistics = {stage: RunningStatistics() for stage in stages}
+            new_logs = self.read_logs()
+        elif stats_json["through"] == latest_date:
+            return {stage: RunningStatistics.from_dict(stats_json["stages"][stage]) for stage in stages}
         else:
-            # request missing logs from Fitbit
-            latest_date_local = dt.strptime(latest_date_local, "%Y-%m-%d")
-            next_date_local = (latest_date_local + timedelta(days=1)).strftime("%Y-%m-%d")
-            date_range = (next_date_local, self.today)
-            fitbit = Fitbit(self.tokens_file_path)
-            raw_logs = fitbit.sleep_logs_range(date_range)
+            stage_statistics = {stage: RunningStatistics.from_dict(stats_json["stages"][stage]) for stage in stages}
+            new_logs = self.read_logs(self.next_date(stats_json["through"]))
 
-            # update sleep_series and sleep_series.json, depending on logs returned from Fitbit
-            if not raw_logs["sleep"]:
-                sleep_series = local_series
-            else:
-                # capture series data from raw logs and append to local_series
-                api_series = self.capture_series_data(raw_logs, date_range)
-                for series in api_series["sleep"]:
-                    local_series["sleep"].append(series)
-                sleep_series = copy.deepcopy(local_series)
+        # update statistics with percentages of new nights
+        durations = new_logs['duration'].values
+        for stage in stages:
+            stage_statistics[stage].update(np.around(new_logs[stage].values / durations, 3) * 100)
 
-                # update sleep_series.json
-                with open(self.sleep_series_file_path, 'w') as series_file:
-                    json.dump(sleep_series, series_file)
+        # persist statistics
+        stats_json = {"through": latest_date,
+                      "stages": {stage: stage_statistics[stage].to_dict() for stage in stages}}
+        with open(self.stats_file_path + '.tmp', 'w') as stats_file:
+            json.dump(stats_json, stats_file)
+        os.replace(self.stats_file_path + '.tmp', self.stats_file_path)
 
-        return sleep_series
+        return stage_statistics
 
-    def initialize_csv(self):
+    def initialize_csv(self, raw_logs, date_range):
         """
         initialize sleep.csv with up-to-date sleep logs
+        :param raw_logs: json object of raw sleep data from Fitbit request
+        :param date_range: tuple of (start_date, end_date) form
         :return sleep_logs: up-to-date sleep logs
         """
 
-        # request all sleep logs from Fitbit
-        date_range = ("2018-08-07", self.today)
-        fitbit = Fitbit(self.tokens_file_path)
-        raw_logs = fitbit.sleep_logs_range(date_range)
-
         # capture explicit data from raw logs
         sleep_logs = self.capture_log_data(raw_logs, date_range)
-        sleep_logs.to_csv(path_or_buf=self.sleep_file_path, mode='w+', date_format="%Y-%m-%d")
-
-        sleep_logs.index = pd.to_datetime(sleep_logs.index)
+        write_csv(sleep_logs, self.sleep_file_path)
 
         return sleep_logs
 
-    def initialize_json(self):
+    def initialize_series(self, raw_logs, date_range):
         """
-        initialize sleep_series.json with up-to-date time series
+        initialize sleep_series store with up-to-date time series
+        :param raw_logs: json object of raw sleep data from Fitbit request
+        :param date_range: tuple of (start_date, end_date) form
         :return sleep_series: up-to-date sleep_series
         """
 
-        # request all sleep series from Fitbit
-        date_range = ("2018-08-07", self.today)
-        fitbit = Fitbit(self.tokens_file_path)
-        raw_logs = fitbit.sleep_logs_range(date_range)
-
         # capture explicit data from raw series
         sleep_series = self.capture_series_data(raw_logs, date_range)
-        with open(self.sleep_series_file_path, 'w+') as series_file:
-            json.dump(sleep_series, series_file)
+        sleep_series.save(self.sleep_series_file_path)
 
         return sleep_series
 
@@ -197,65 +454,39 @@ class Sleep(object):
         capture explicit data from raw sleep logs
         :param sleep_raw_logs: json object of raw sleep data from Fitbit request
         :param date_range: tuple of (start_date, end_date) form
-        :return sleep_logs: dataFrame of explicit sleep data captured from raw logs
+        :return sleep_logs: dataFrame of explicit sleep data captured from raw logs,
+                            indexed by every date of date_range
         """
 
         # initialize parameters
-        dict_labels = ["dateOfSleep", "minutesAfterWakeup",
-                       "minutesToFallAsleep", "startTime"]
+        dict_labels = ["minutesAfterWakeup", "minutesToFallAsleep", "startTime"]
         stages_labels = ["deep", "light", "rem", "wake"]
-        sleep_logs = []
-        frames = []
-        start_date = dt.strptime(date_range[0], "%Y-%m-%d")
-        end_date = dt.strptime(date_range[1], "%Y-%m-%d")
-        num_days = end_date - start_date
-        index = 0
-        dates = [(end_date - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(0, num_days.days + 1)]
-
-        # create dictionary list to capture explicit data
+        columns = {label: [] for label in ["dateOfSleep"] + dict_labels + stages_labels}
+        dates = pd.date_range(date_range[0], date_range[1], freq='D', name="dateOfSleep")
+
+        # capture each field of main sleep logs in single pass
         for raw_log in sleep_raw_logs["sleep"]:
-            sleep_log = dict()
-            duration_sleep = 0
-            duration_total = 0
+            if not raw_log.get("isMainSleep", True):
+                continue
+            columns["dateOfSleep"].append(raw_log["dateOfSleep"])
             for label in dict_labels:
-                sleep_log[label] = [raw_log[label]]
+                columns[label].append(raw_log[label])
             for label in stages_labels:
-                sleep_log[label] = [raw_log["levels"]["summary"][label]["minutes"]]
-                duration_total += sleep_log[label][0]
-            for label in stages_labels[:-1]:
-                duration_sleep += sleep_log[label][0]
-            sleep_log["efficiency"] = [round(duration_sleep / duration_total, 2)]
-            sleep_log["duration"] = [duration_total]
-            sleep_logs.append(sleep_log)
-
-        # append missing data to sleep logs
-        for raw_log, date in zip(sleep_raw_logs["sleep"], dates):
-            if date == raw_log["dateOfSleep"]:
-                index += 1
-                continue
-            else:
-                sleep_log = dict()
-                sleep_log["dateOfSleep"] = [date]
-                for label in dict_labels[1:]:
-                    sleep_log[label] = [float('nan')]
-                for label in stages_labels:
-                    sleep_log[label] = [float('nan')]
-                sleep_log["efficiency"] = [float('nan')]
-                sleep_log["duration"] = [float('nan')]
-                sleep_logs.insert(index, sleep_log)
-                dates.remove(date)
-                index += 2
-
-        sleep_logs.reverse()
-
-        # create DataFrame list from dictionary list
-        for log in sleep_logs:
-            df = pd.DataFrame.from_dict(data=log)
-            frames.append(df)
-
-        # concatenate DataFrames and set index
-        sleep_logs = pd.concat(frames)
-        sleep_logs = sleep_logs.set_index('dateOfSleep')
+                columns[label].append(raw_log["levels"]["summary"].get(label, {}).get("minutes", float('nan')))
+
+        # create single DataFrame, computing efficiency and duration from stage minutes
+        sleep_logs = pd.DataFrame(columns)
+        sleep_logs["dateOfSleep"] = pd.to_datetime(sleep_logs["dateOfSleep"])
+        sleep_logs[stages_labels] = sleep_logs[stages_labels].astype(float)
+        duration_total = sleep_logs[stages_labels].sum(axis=1, min_count=1)
+        duration_sleep = sleep_logs[stages_labels[:-1]].sum(axis=1, min_count=1)
+        sleep_logs["efficiency"] = np.around(duration_sleep / duration_total, 2)
+        sleep_logs["duration"] = duration_total
+
+        # index by date, filling missing dates with nan
+        sleep_logs = sleep_logs.drop_duplicates(subset="dateOfSleep").set_index("dateOfSleep")
+        sleep_logs = sleep_logs.reindex(dates)
+        sleep_logs[dict_labels[:-1]] = sleep_logs[dict_labels[:-1]].astype(float)
 
         return sleep_logs
 
@@ -264,134 +495,86 @@ class Sleep(object):
         capture series data from raw sleep logs
         :param sleep_raw_logs: json object of raw sleep data from Fitbit request
         :param date_range: tuple of (start_date, end_date) form
-        :return sleep_series: dataFrame of sleep series data captured from raw logs
+        :return sleep_series: SleepSeries of epochs captured from raw logs, with a night for every date
+                              of date_range and missing nights recorded as empty offset spans
         """
 
         # initialize parameters
-        start_date = dt.strptime(date_range[0], "%Y-%m-%d")
-        end_date = dt.strptime(date_range[1], "%Y-%m-%d")
-        num_days = end_date - start_date
-        stages = ['deep', 'light', 'rem', 'wake']
-        index = 0
-        dates = [(end_date - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(0, num_days.days + 1)]
-        sleep_series = {"sleep": []}
-        series_template = {"dateOfSleep": None,
-                           "data": {"deep": {"start_times": [],
-                                             "epoch_durations": []},
-                                    "light": {"start_times": [],
-                                              "epoch_durations": []},
-                                    "rem": {"start_times": [],
-                                            "epoch_durations": []},
-                                    "wake": {"start_times": [],
-                                             "epoch_durations": []}},
-                           "shortData": {"wake": {"start_times": [],
-                                                  "epoch_durations": []}}}
-
-        # create json format dictionary to capture sleep series data
+        dates = np.arange(np.datetime64(date_range[0]), np.datetime64(date_range[1]) + 1)
+        epoch_counts = np.zeros(len(dates), dtype=np.int64)
+        nights = []
+
+        # count epochs of each staged main sleep log within date_range
         for raw_log in sleep_raw_logs["sleep"]:
-            series = copy.deepcopy(series_template)
-            series["dateOfSleep"] = raw_log["dateOfSleep"]
+            night = (np.datetime64(raw_log["dateOfSleep"]) - dates[0]).astype(np.int64)
+            if not (raw_log.get("isMainSleep", True) and raw_log.get("type", "stages") == "stages"):
+                continue
+            if night < 0 or night >= len(dates) or epoch_counts[night]:
+                continue
+            epoch_counts[night] = len(raw_log["levels"]["data"]) + len(raw_log["levels"]["shortData"])
+            nights.append((night, raw_log))
+
+        # preallocate typed arrays of epochs
+        offsets = np.zeros(len(dates) + 1, dtype=np.int64)
+        np.cumsum(epoch_counts, out=offsets[1:])
+        start_times = np.empty(offsets[-1], dtype='U23')
+        durations = np.empty(offsets[-1], dtype=np.int32)
+        stages = np.empty(offsets[-1], dtype=np.uint8)
+
+        # stream epochs of each night into its span of the arrays
+        for night, raw_log in nights:
+            position = offsets[night]
             for epoch in raw_log["levels"]["data"]:
-                series["data"][epoch["level"]]["start_times"].append(epoch["dateTime"])
-                series["data"][epoch["level"]]["epoch_durations"].append(epoch["seconds"])
+                start_times[position] = epoch["dateTime"]
+                durations[position] = epoch["seconds"]
+                stages[position] = STAGE_CODES[epoch["level"]]
+                position += 1
             for epoch in raw_log["levels"]["shortData"]:
-                series["shortData"][epoch["level"]]["start_times"].append(epoch["dateTime"])
-                series["shortData"][epoch["level"]]["epoch_durations"].append(epoch["seconds"])
-            sleep_series["sleep"].append(series)
-
-        # append missing data to series
-        for raw_log, date in zip(sleep_raw_logs["sleep"], dates):
-            if date == raw_log["dateOfSleep"]:
-                index += 1
-                continue
-            else:
-                series = copy.deepcopy(series_template)
-                series["dateOfSleep"] = date
-                for stage in stages:
-                    series["data"][stage]["start_times"].append(0)
-                    series["data"][stage]["epoch_durations"].append(0)
-                series["shortData"]["wake"]["start_times"].append(0)
-                series["shortData"]["wake"]["epoch_durations"].append(0)
-                sleep_series["sleep"].insert(index, series)
-                dates.remove(date)
-                index += 2
-
-        sleep_series["sleep"].reverse()
-        return sleep_series
+                start_times[position] = epoch["dateTime"]
+                durations[position] = epoch["seconds"]
+                stages[position] = SHORT_WAKE_CODE
+                position += 1
+
+        # parse start times in single pass
+        start_times = start_times.astype('datetime64[s]').astype(np.int64)
+
+        return SleepSeries(dates, offsets, start_times, durations, stages)
 
-    def plot_stages_percent(self, grid_shape, position, rowspan, colspan):
+    def plot_inputs(self, days=15):
         """
-        plot percentages of four sleep stages for each of last 15 days using grouped bar graph
+        capture data plotted for last days, used to key rendered figures
+        :param days: integer of days plotted
+        :return: list of plotted sleep logs, epoch arrays and lifetime medians
+        """
+
+        sleep_series = self.sleep_series.tail(days)
+        medians = [round(self.stage_statistics[stage].median, 3) for stage in ['wake', 'rem', 'light', 'deep']]
+
+        return [self.sleep_logs.iloc[-days:], sleep_series.dates, sleep_series.offsets, sleep_series.start_times,
+                sleep_series.durations, sleep_series.stages, medians]
+
+    def plot_stages_percent(self, grid_shape, position, rowspan, colspan, days=15):
+        """
+        plot percentages of four sleep stages for each of last days using grouped bar graph
+        spans longer than max_bar_groups days are plotted as weekly or monthly means of nightly percentages
+        bars, median overlays and annotations are each drawn as single collection,
+        kept in self.stages_artists and filled by update_stages_percent(), or by pan_stages_percent() when panned
         :param grid_shape: tuple of (row, column) form
         :param position: tuple of (row, column) form
         :param rowspan: integer of row span
         :param colspan: integer of column span
+        :param days: integer of days plotted
         """
 
         # initialize graph params
         plt.rc('xtick', labelsize=18)
         plt.rc('ytick', labelsize=18)
-        x = self.sleep_logs.index.tolist()[-15:]
-        x = date2num(x)
-        xmin = self.sleep_logs.index.tolist()[-15]
-        xmax = self.sleep_logs.index.tolist()[-1]
-        numdays = xmax-xmin
-        median_array_shape = (1, len(x))
-        xticks = [xmin + timedelta(days=d) for d in range(0, numdays.days+1)]
-        bar_width = 0.2
         labelpad = 12.5
         labelfontsize = 20
-        dateformat = '%a-%b-%d'
         alpha = 0.3
         medians_color = 'k'
-        annotate_height = 0.5
-        annotate_fontsize = 18
-        annotate_fontweight = 'heavy'
-        annotate_align = 'center'
         annotate_color = 'w'
-
-        # initialize y-axis data
-        durations = self.sleep_logs.loc[xmin:xmax]['duration'].values
-        durations_lifetime = self.sleep_logs['duration'].values
-
-        awake_perc = np.around(self.sleep_logs.loc[xmin:xmax]['wake'].values / durations, 3) * 100
-        rem_perc = np.around(self.sleep_logs.loc[xmin:xmax]['rem'].values / durations, 3) * 100
-        light_perc = np.around(self.sleep_logs.loc[xmin:xmax]['light'].values / durations, 3) * 100
-        deep_perc = np.around(self.sleep_logs.loc[xmin:xmax]['deep'].values / durations, 3) * 100
-
-        # convert nan to 0
-        awake_perc = np.nan_to_num(awake_perc)
-        rem_perc = np.nan_to_num(rem_perc)
-        light_perc = np.nan_to_num(light_perc)
-        deep_perc = np.nan_to_num(deep_perc)
-
-        # store percentage values of each sleep stage in array
-        awake_perc_lifetime = np.around(self.sleep_logs['wake'].values / durations_lifetime, 3) * 100
-        rem_perc_lifetime = np.around(self.sleep_logs['rem'].values / durations_lifetime, 3) * 100
-        light_perc_lifetime = np.around(self.sleep_logs['light'].values / durations_lifetime, 3) * 100
-        deep_perc_lifetime = np.around(self.sleep_logs['deep'].values / durations_lifetime, 3) * 100
-
-        # compute lifetime medians for each sleep stage
-        awake_median = float(np.around(np.nanmedian(awake_perc_lifetime), 3))
-        rem_median = float(np.around(np.nanmedian(rem_perc_lifetime), 3))
-        light_median = float(np.around(np.nanmedian(light_perc_lifetime), 3))
-        deep_median = float(np.around(np.nanmedian(deep_perc_lifetime), 3))
-
-        # create repeating array of medians for each sleep stage
-        awake_median_array = np.full(median_array_shape, awake_median)[0]
-        rem_median_array = np.full(median_array_shape, rem_median)[0]
-        light_median_array = np.full(median_array_shape, light_median)[0]
-        deep_median_array = np.full(median_array_shape, deep_median)[0]
-
-        # initialize masks for medians and percentage values
-        mask_awake_perc = ma.where(awake_perc>=awake_median_array)
-        mask_awake_median = ma.where(awake_median_array>=awake_perc)
-        mask_rem_perc = ma.where(rem_perc>=rem_median_array)
-        mask_rem_median = ma.where(rem_median_array>=rem_perc)
-        mask_light_perc = ma.where(light_perc>=light_median_array)
-        mask_light_median = ma.where(light_median_array>=light_perc)
-        mask_deep_perc = ma.where(deep_perc>=deep_median_array)
-        mask_deep_median = ma.where(deep_median_array>=deep_perc)
+        stages = [('wake', 'm', 'Awake'), ('rem', 'c', 'REM'), ('light', 'C0', 'Light'), ('deep', 'b', 'Deep')]
 
         # setup plot
         ax = plt.subplot2grid(grid_shape, position, rowspan=rowspan, colspan=colspan, fig=self.sleep_fig)
@@ -399,116 +582,379 @@ class Sleep(object):
         ax.set_title('Sleep Stage Percentages', fontsize=30, pad=15)
         ax.set_ylabel('Percentage', fontsize=labelfontsize, labelpad=labelpad)
         plt.setp(ax.xaxis.get_majorticklabels(), rotation=0, ha='center', rotation_mode='anchor')
-        ax.set_xticks(xticks)
         ax.set_yticks(np.arange(0, 110, 5))
-        ax.xaxis.set_major_formatter(mdates.DateFormatter(dateformat))
 
-        # annotate bars
-        for x_pos, awake_p, rem_p, light_p, deep_p in zip(x, awake_perc, rem_perc, light_perc, deep_perc):
-            if awake_p == 0 and rem_p == 0 and light_p == 0 and deep_p == 0:
-                ax.text(x_pos, annotate_height, 'nan', fontsize=annotate_fontsize,
-                        fontweight='normal', horizontalalignment=annotate_align, color=annotate_color)
-            else:
-                ax.text(x_pos-0.3, annotate_height, int(round(awake_p, 0)), fontsize=annotate_fontsize,
-                        fontweight=annotate_fontweight, horizontalalignment=annotate_align, color=annotate_color)
-                ax.text(x_pos-0.1, annotate_height, int(round(rem_p, 0)), fontsize=annotate_fontsize,
-                        fontweight=annotate_fontweight, horizontalalignment=annotate_align, color=annotate_color)
-                ax.text(x_pos+0.1, annotate_height, int(round(light_p, 0)), fontsize=annotate_fontsize,
-                        fontweight=annotate_fontweight, horizontalalignment=annotate_align, color=annotate_color)
-                ax.text(x_pos+0.3, annotate_height, int(round(deep_p, 0)), fontsize=annotate_fontsize,
-                        fontweight=annotate_fontweight, horizontalalignment=annotate_align, color=annotate_color)
-
-        # plot stages with masks
-        ax.bar((x-0.3)[mask_awake_median], awake_median_array[mask_awake_median], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar(x-0.3, awake_perc, color='m', width=bar_width, align='center', label='Awake')
-        ax.bar((x-0.3)[mask_awake_perc], awake_median_array[mask_awake_perc], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar((x-0.1)[mask_rem_median], rem_median_array[mask_rem_median], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar(x-0.1, rem_perc, color='c', width=bar_width, align='center', label='REM')
-        ax.bar((x-0.1)[mask_rem_perc], rem_median_array[mask_rem_perc], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar((x+0.1)[mask_light_median], light_median_array[mask_light_median], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar(x+0.1, light_perc, width=bar_width, align='center', label='Light')
-        ax.bar((x+0.1)[mask_light_perc], light_median_array[mask_light_perc], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar((x+0.3)[mask_deep_median], deep_median_array[mask_deep_median], alpha=alpha,
-               color=medians_color, width=bar_width, align='center')
-        ax.bar(x+0.3, deep_perc, color='b', width=bar_width, align='center', label='Deep')
-        ax.bar((x+0.3)[mask_deep_perc], deep_median_array[mask_deep_perc], alpha=alpha,
-               color=medians_color, width=bar_width, align='center', label='Median')
-
-        plt.legend(prop={'size': 15}, loc='upper right')
-
-    def plot_efficiency(self, grid_shape, position, rowspan, colspan):
-        """
-        plot sleep efficiency for last 15 days using bar graph
+        # create collections of medians below stage percentages, stage percentages and medians above them
+        medians_under = PolyCollection([], facecolors=medians_color, edgecolors='none', alpha=alpha)
+        stage_bars = PolyCollection([], facecolors=[color for stage, color, label in stages], edgecolors='none')
+        medians_over = PolyCollection([], facecolors=medians_color, edgecolors='none', alpha=alpha)
+        for collection in [medians_under, stage_bars, medians_over]:
+            collection.sticky_edges.y.append(0)
+            ax.add_collection(collection, autolim=False)
+
+        # create collection of annotations, drawn as text paths sized in points at data positions
+        annotations = PathCollection([], offsets=np.zeros((0, 2)), offset_transform=ax.transData,
+                                     transform=Affine2D().scale(1/72) + self.sleep_fig.dpi_scale_trans,
+                                     facecolors=annotate_color, edgecolors='none')
+        ax.add_collection(annotations, autolim=False)
+
+        # create legend from proxies of stage colors
+        handles = [Patch(color=color, label=label) for stage, color, label in stages]
+        handles.append(Patch(color=medians_color, alpha=alpha, label='Median'))
+        ax.legend(handles=handles, prop={'size': 15}, loc='upper right')
+
+        self.stages_artists = {'ax': ax, 'days': days, 'stages': [stage for stage, color, label in stages],
+                               'medians_under': medians_under, 'stage_bars': stage_bars,
+                               'medians_over': medians_over, 'annotations': annotations, 'updating': False}
+
+        self.update_stages_percent()
+        ax.callbacks.connect('xlim_changed', self.pan_stages_percent)
+
+    def update_stages_percent(self):
+        """
+        update collections of stages plot in place with last days of sleep_logs and rescale axes to them
+        :return: list of axes updated
+        """
+
+        # capture last days
+        artists = self.stages_artists
+        end = self.sleep_logs.index[-1]
+        start = end - timedelta(days=artists['days'] - 1)
+
+        # fill bars, then rescale axes without refilling bars for rescaled view
+        artists['updating'] = True
+        verts = self.fill_stages_percent(start, end)
+        ax = artists['ax']
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim(verts.reshape(-1, 2))
+        ax.autoscale_view()
+        artists['updating'] = False
+
+        return [ax]
+
+    def pan_stages_percent(self, ax):
+        """
+        refill collections of stages plot with nights visible after pan or zoom, called on xlim_changed
+        :param ax: axes object of stages plot
+        """
+
+        if not self.stages_artists['updating']:
+            (start, end) = view_range(ax)
+            self.stages_artists['updating'] = True
+            self.fill_stages_percent(start - timedelta(hours=12), end + timedelta(hours=12))
+            self.stages_artists['updating'] = False
+
+    def bar_groups(self, start, end):
+        """
+        capture periods of nightly rollups from start to end, per night or per week or month of rollups
+        when nights exceed max_bar_groups
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :return: tuple of (tier name, dataFrame of nightly values or period means, array of date numbers
+                 of period centres, (periods, 1) array of days in each period) form
+        """
+
+        tier = self.rollups.select(start, end, self.max_bar_groups)
+        window = self.rollups.window(tier, start, end)
+        means = window if tier == 'day' else window.xs('mean', axis=1, level=1)
+        x = date2num(self.rollups.centres(tier, window.index))
+
+        return tier, means, x, self.rollups.period_days(tier, window.index)[:, None]
+
+    def fill_stages_percent(self, start, end):
+        """
+        fill collections of stages plot with percentages from start to end, scaling bar groups to period length
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :return: array of (bars, 4, 2) vertices of bars and median overlays
+        """
+
+        # initialize parameters
+        artists = self.stages_artists
+        offsets = np.array([-0.3, -0.1, 0.1, 0.3])
+        bar_width = 0.2
+        annotate_height = 0.5
+        annotate_fontsize = 18
+        (tier, means, x, period_days) = self.bar_groups(start, end)
+
+        # compute periods x stages matrix of percentages, converting nan to 0
+        perc = np.nan_to_num(means[artists['stages']].values)
+        medians = np.array([round(self.stage_statistics[stage].median, 3) for stage in artists['stages']])
+        no_logs = ~perc.any(axis=1)
+
+        # update bars, showing lifetime medians below or above percentages
+        lefts = x[:, None] + (offsets - bar_width/2) * period_days
+        widths = bar_width * period_days
+        bars = {'medians_under': self.bar_verts(lefts, np.where(medians >= perc, medians, 0), widths),
+                'stage_bars': self.bar_verts(lefts, perc, widths),
+                'medians_over': self.bar_verts(lefts, np.where(perc >= medians, medians, 0), widths)}
+        for label, verts in bars.items():
+            artists[label].set_verts(verts)
+
+        # update annotations of bars and of days without logs, omitted when bars are too narrow to label
+        annotated = np.full(len(x), tier == 'day' and len(x) <= 15)
+        labelled = annotated & ~no_logs
+        unlabelled = annotated & no_logs
+        labels = [str(int(round(p, 0))) for p in perc[labelled].ravel()] + ['nan'] * int(unlabelled.sum())
+        weights = ['heavy'] * perc[labelled].size + ['normal'] * int(unlabelled.sum())
+        positions = np.concatenate([(x[labelled, None] + offsets).ravel(), x[unlabelled]])
+        artists['annotations'].set_paths([text_path(label, annotate_fontsize, weight)
+                                          for label, weight in zip(labels, weights)])
+        artists['annotations'].set_offsets(np.column_stack([positions, np.full(len(positions), annotate_height)]))
+
+        # update date ticks, labelling at most 15 periods back from latest
+        self.set_date_ticks(artists['ax'], tier, x)
+
+        return np.concatenate(list(bars.values()))
+
+    def set_date_ticks(self, ax, tier, x):
+        """
+        label at most 15 periods back from latest, formatted for tier
+        ticks are set by locator, as set_xticks() would widen view limits to ticks of periods at view edges
+        :param ax: axes object
+        :param tier: string of tier name
+        :param x: array of date numbers of period centres
+        """
+
+        ax.xaxis.set_major_formatter(mdates.DateFormatter(self.tick_formats[tier]))
+        ax.xaxis.set_major_locator(FixedLocator(x[::-max(1, -(-len(x) // 15))][::-1]))
+
+    @staticmethod
+    def bar_verts(lefts, heights, bar_width):
+        """
+        convert bar positions and heights to rectangle vertices of collection
+        :param lefts: array of left edges of bars
+        :param heights: array of bar heights, same shape as lefts
+        :param bar_width: float of bar width, or array of bar widths broadcastable to shape of lefts
+        :return: array of (bars, 4, 2) vertices
+        """
+
+        widths = np.ravel(np.broadcast_to(bar_width, np.shape(lefts)))
+        lefts = np.ravel(lefts)
+        heights = np.ravel(heights)
+        verts = np.zeros((len(lefts), 4, 2))
+        verts[:, :2, 0] = lefts[:, None]
+        verts[:, 2:, 0] = (lefts + widths)[:, None]
+        verts[:, 1:3, 1] = heights[:, None]
+
+        return verts
+
+    def plot_efficiency(self, grid_shape, position, rowspan, colspan, days=15):
+        """
+        plot sleep efficiency for each of last days using bar graph
+        spans longer than max_bar_groups days are plotted as weekly or monthly means of nightly efficiency
+        bars and annotations are each drawn as single collection,
+        kept in self.efficiency_artists and filled by update_efficiency(), or by pan_efficiency() when panned
         :param grid_shape: tuple of (row, column) form
         :param position: tuple of (row, column) form
         :param rowspan: integer of row span
         :param colspan: integer of column span
+        :param days: integer of days plotted
         """
 
         # initialize parameters
-        x = self.sleep_logs.index.tolist()[-15:]
-        y = np.nan_to_num(self.sleep_logs['efficiency'].values[-15:])
         labelpad = 10
         labelfontsize = 20
-        dateformat = "%a-%b-%d"
 
         # setup plot
         ax = plt.subplot2grid(grid_shape, position, rowspan=rowspan, colspan=colspan, fig=self.sleep_fig)
         ax.grid(axis='y')
         ax.set_title('Sleep Efficiency', fontsize=30, pad=15)
         ax.set_ylabel('Efficiency', fontsize=labelfontsize, labelpad=labelpad)
-        ax.set_xticks(x)
-        ax.set_ylim(np.nanmin(np.asarray(y)), 1.0)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter(dateformat))
-
-        # annotate bars
-        for date, height in zip(x, y):
-            if height == 0.0:
-                ax.text(date, height+0.02, 'nan', fontsize=18, horizontalalignment='center',
-                        fontweight='normal')
-            else:
-                ax.text(date, height+0.02, height, fontsize=18,
-                        fontweight='heavy', horizontalalignment='center')
 
-        ax.bar(x, y, width=0.3)
+        # create collections of bars and annotations, clipping annotations only to x-extent of axes,
+        # so labels of tall bars may rise above axes, and leaving them out of layout like clipped artists
+        bars = PolyCollection([], facecolors='C0', edgecolors='none')
+        bars.sticky_edges.y.append(0)
+        ax.add_collection(bars, autolim=False)
+        annotations = PathCollection([], offsets=np.zeros((0, 2)), offset_transform=ax.transData,
+                                     transform=Affine2D().scale(1/72) + self.sleep_fig.dpi_scale_trans,
+                                     facecolors='k', edgecolors='none')
+        ax.add_collection(annotations, autolim=False)
+        annotations.set_clip_box(TransformedBbox(Bbox([[0, -1], [1, 2]]), ax.transAxes))
+        annotations.set_in_layout(False)
+
+        self.efficiency_artists = {'ax': ax, 'days': days, 'bars': bars, 'annotations': annotations,
+                                   'updating': False}
+
+        self.update_efficiency()
+        ax.callbacks.connect('xlim_changed', self.pan_efficiency)
+
+    def update_efficiency(self):
+        """
+        update collections of efficiency plot in place with last days of sleep_logs and rescale axes to them
+        :return: list of axes updated
+        """
+
+        # capture last days
+        artists = self.efficiency_artists
+        end = self.sleep_logs.index[-1]
+        start = end - timedelta(days=artists['days'] - 1)
+
+        # fill bars, then rescale axes without refilling bars for rescaled view
+        artists['updating'] = True
+        (verts, heights) = self.fill_efficiency(start, end)
+        ax = artists['ax']
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim(verts.reshape(-1, 2))
+        ax.autoscale_view()
+        ax.set_ylim(np.min(heights), 1.0)
+        artists['updating'] = False
 
-    def plot_polar_hypnograms(self, grid_shape):
+        return [ax]
+
+    def pan_efficiency(self, ax):
+        """
+        refill collections of efficiency plot with nights visible after pan or zoom, called on xlim_changed
+        :param ax: axes object of efficiency plot
+        """
+
+        if not self.efficiency_artists['updating']:
+            (start, end) = view_range(ax)
+            self.efficiency_artists['updating'] = True
+            self.fill_efficiency(start - timedelta(hours=12), end + timedelta(hours=12))
+            self.efficiency_artists['updating'] = False
+
+    def fill_efficiency(self, start, end):
+        """
+        fill collections of efficiency plot with efficiency from start to end, scaling bars to period length
+        :param start: datetime of first date
+        :param end: datetime of last date
+        :return: tuple of (array of (bars, 4, 2) vertices, array of bar heights) form
+        """
+
+        # initialize parameters
+        bar_width = 0.3
+        annotate_fontsize = 18
+        annotate_pad = 0.02
+        artists = self.efficiency_artists
+        (tier, means, x, period_days) = self.bar_groups(start, end)
+        heights = np.nan_to_num(np.around(means['efficiency'].values, 2))
+
+        # update bars
+        widths = bar_width * period_days[:, 0]
+        verts = self.bar_verts(x - widths/2, heights, widths)
+        artists['bars'].set_verts(verts)
+
+        # update annotations, omitted when bars are too narrow to label
+        if tier == 'day' and len(x) <= 15:
+            labels = ['nan' if height == 0.0 else str(height) for height in heights]
+            weights = ['normal' if height == 0.0 else 'heavy' for height in heights]
+            artists['annotations'].set_paths([text_path(label, annotate_fontsize, weight)
+                                              for label, weight in zip(labels, weights)])
+            artists['annotations'].set_offsets(np.column_stack([x, heights + annotate_pad]))
+        else:
+            artists['annotations'].set_paths([])
+            artists['annotations'].set_offsets(np.zeros((0, 2)))
+
+        # update date ticks
+        self.set_date_ticks(artists['ax'], tier, x)
+
+        return verts, heights
+
+    def plot_polar_hypnograms(self, grid_shape, row=3, title_position=(0.51, 0.185)):
         """
         plot 15 polar hypnograms horizontally
         :param grid_shape: tuple of form (rows, columns)
+        :param row: integer of grid row
+        :param title_position: tuple of (x, y) figure coordinates of title
         """
 
+        # read epochs of last 15 nights only
+        sleep_series = self.sleep_series.tail(15)
+        self.hypnogram_artists = []
+
         # plot hypnograms horizontally
-        for series_index, col_index in zip(range(-15, 0), range(0, 15)):
-            self.polar_hypnogram(self.sleep_series["sleep"][series_index], grid_shape, (3, col_index))
+        for series_index, ax in zip(range(-15, 0), self.polar_axes(grid_shape, row=row, columns=15)):
+            self.polar_hypnogram(ax, sleep_series.night(series_index))
 
         # set title
-        plt.figtext(0.51, 0.185, "Hypnograms", fontsize=30, horizontalalignment='center')
+        self.sleep_fig.text(title_position[0], title_position[1], "Hypnograms", fontsize=30,
+                            horizontalalignment='center')
 
-    def polar_hypnogram(self, sleep_series, grid_shape, position):
+    def polar_axes(self, grid_shape, row, columns):
         """
-        plot single hypnogram
-        :param sleep_series: dictionary in json form storing sleep time series
+        create row of hypnogram axes sharing tick locators, formatters and radial limits,
+        so polar axes setup is built once on first axes
         :param grid_shape: tuple of (rows, columns) form
-        :param position: tuple of (row, column) form
+        :param row: integer of grid row
+        :param columns: integer of axes created from first grid column
+        :return: list of polar axes
         """
 
-        # initialize parameters
-        stages = ['deep', 'light', 'rem', 'wake']
-        start_times = {}
-        epoch_durations = {}
+        # create axes, setting shared ticks once all axes exist since creating polar axes resets them
+        axes = [plt.subplot2grid(grid_shape, (row, 0), polar=True, fig=self.sleep_fig)]
+        for col_index in range(1, columns):
+            axes.append(plt.subplot2grid(grid_shape, (row, col_index), polar=True, fig=self.sleep_fig,
+                                         sharex=axes[0], sharey=axes[0]))
+        axes[0].set_xticks(np.linspace(0, 2 * pi, 24, endpoint=False))
+        axes[0].set_xticklabels(range(0, 24))
+        axes[0].set_rgrids([2, 3, 4], labels=["", "", ""])
+        # radial limits leave empty centre for duration annotation
+        axes[0].set_ylim(-0.645, 4.745)
+
+        # setup orientation and tick styles of each axes
+        for ax in axes:
+            ax.set_theta_zero_location('N')
+            ax.set_theta_direction(-1)
+            ax.tick_params(axis='x', which='major', labelsize=14, pad=1)
+            ax.set_rlabel_position(0)
+            ax.grid(False)
+            # hypnograms show fixed nights, so pan and zoom only move time axes
+            ax.set_navigate(False)
+
+        return axes
+
+    def update_polar_hypnograms(self):
+        """
+        redraw epochs, titles and durations of existing hypnogram axes with last 15 nights
+        :return: list of axes updated
+        """
+
+        # read epochs of last 15 nights only
+        sleep_series = self.sleep_series.tail(15)
+        axes = []
+
+        for series_index, artists in zip(range(-15, 0), self.hypnogram_artists):
+            night = sleep_series.night(series_index)
+            if night['dateOfSleep'] != artists['dateOfSleep']:
+                self.draw_hypnogram(artists, night)
+                axes.append(artists['ax'])
+
+        return axes
+
+    def polar_hypnogram(self, ax, sleep_series):
+        """
+        plot single hypnogram
+        artists are appended to self.hypnogram_artists
+        :param ax: polar axes from polar_axes()
+        :param sleep_series: dictionary of dateOfSleep and epoch arrays from SleepSeries.night()
+        """
+
+        # create collection of epochs and annotation, then draw night
+        epochs = PathCollection([], edgecolors='none')
+        ax.add_collection(epochs, autolim=False)
+        text = ax.text(0, 0, '', fontsize=15, verticalalignment='top', horizontalalignment='center')
+        artists = {'ax': ax, 'text': text, 'epochs': epochs, 'dateOfSleep': None}
+        self.draw_hypnogram(artists, sleep_series)
+        self.hypnogram_artists.append(artists)
+
+    def draw_hypnogram(self, artists, sleep_series):
+        """
+        draw epochs of night on hypnogram axes as single collection, updating title and duration annotation
+        :param artists: dictionary of hypnogram axes and artists
+        :param sleep_series: dictionary of dateOfSleep and epoch arrays from SleepSeries.night()
+        """
+
+        # initialize parameters, indexed by stage code with short wake epochs merged into wake stage
+        ax = artists['ax']
+        radii = np.array([4, 3, 4, 2, 2])
+        colors = to_rgba_array(['b', 'C0', 'c', 'm', 'm'])
         bar_height = 1
+        codes = [Path.MOVETO, Path.LINETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY]
         date_datetime = dt.strptime(sleep_series["dateOfSleep"], "%Y-%m-%d")
         date_str = date_datetime.strftime("%a-%b-%d")
-        sleep_logs = self.sleep_logs.copy(deep=True)
-        sleep_logs.index = sleep_logs.index.strftime("%Y-%m-%d")
-        total_min = sleep_logs.loc[sleep_series["dateOfSleep"]]["duration"]
+        total_min = self.night_durations.get(sleep_series["dateOfSleep"], float('nan'))
         if isnan(total_min):
             duration = 'nan'
         else:
@@ -518,39 +964,70 @@ class Sleep(object):
 
         title = date_str
 
-        # convert dateTimes to radians
-        for stage in stages:
-            start_times[stage] = time2radian(sleep_series['data'][stage]['start_times'])
-            epoch_durations[stage] = time2radian(sleep_series['data'][stage]['epoch_durations'])
-        start_times["wake"] = start_times["wake"] + time2radian(sleep_series["shortData"]["wake"]["start_times"])
-        epoch_durations["wake"] = epoch_durations["wake"] + time2radian(sleep_series["shortData"]["wake"]["epoch_durations"])
-
-        # setup plot
-        ax = plt.subplot2grid(grid_shape, position, polar=True, fig=self.sleep_fig)
-        ax.barh(0, width=0)
-        ax.barh(1, width=0)
-        ax.barh(2, left=start_times['wake'], width=epoch_durations['wake'], color='m', label='Awake', height=bar_height)
-        ax.barh(4, left=start_times['rem'], width=epoch_durations['rem'], color='c', label='REM', height=bar_height)
-        ax.barh(3, left=start_times['light'], width=epoch_durations['light'], color='C0', label='Light', height=bar_height)
-        ax.barh(4, left=start_times['deep'], width=epoch_durations['deep'], color='b', label='Deep', height=bar_height)
-        ax.set_theta_zero_location('N')
-        ax.set_theta_direction(-1)
-        ax.set_xticks(np.linspace(0, 2 * pi, 24, endpoint=False))
-        ax.set_xticklabels(range(0, 24), fontsize=14)
-        ax.tick_params(axis='x', which='major', pad=1)
-        ax.set_rlabel_position(0)
-        ax.set_rgrids([2, 3, 4], labels=["", "", "", ""], color='k',
-                      fontsize=12, fontweight='bold', verticalalignment='center')
+        # convert dateTimes to radians and epochs to (theta, radius) rectangles, drawn as arcs by polar axes
+        starts = time2radian(sleep_series['start_times'])
+        ends = starts + time2radian(sleep_series['durations'])
+        inner = radii[sleep_series['stages']] - bar_height/2
+        verts = np.zeros((len(starts), 5, 2))
+        verts[:, [0, 3, 4], 0] = starts[:, None]
+        verts[:, 1:3, 0] = ends[:, None]
+        verts[:, [0, 1, 4], 1] = inner[:, None]
+        verts[:, 2:4, 1] = inner[:, None] + bar_height
+
+        # draw epochs
+        artists['epochs'].set_paths([Path(v, codes, _interpolation_steps=100) for v in verts])
+        artists['epochs'].set_facecolor(colors[sleep_series['stages']])
+        artists['dateOfSleep'] = sleep_series["dateOfSleep"]
         ax.set_title(label=title, pad=-180, fontsize=18)
-        ax.grid(False)
 
         # annotate plot
-        if duration == 'nan':
-            ax.text(0, 0, duration, fontsize=15, fontweight='normal',
-                    verticalalignment='top', horizontalalignment='center')
-        else:
-            ax.text(0, 0, duration, fontsize=15, fontweight='heavy',
-                    verticalalignment='top', horizontalalignment='center')
+        artists['text'].set_text(duration)
+        artists['text'].set_fontweight('normal' if duration == 'nan' else 'heavy')
+
+    def plot_page(self, figure_size, grid_shape=(4, 15), stages_position=(0, 0), efficiency_position=(2, 0)):
+        """
+        plot stages, efficiency and hypnograms of last 15 days on sleep_fig, as shown by dashboard
+        :param figure_size: tuple of (width, height) figure size in inches
+        :param grid_shape: tuple of (rows, columns) form, hypnograms fill last row
+        :param stages_position: tuple of (row, column) form of stages plot spanning two rows
+        :param efficiency_position: tuple of (row, column) form of efficiency plot
+        :return: figure object
+        """
+
+        self.sleep_fig.set_size_inches(figure_size)
+        self.plot_stages_percent(grid_shape, stages_position, rowspan=2, colspan=grid_shape[1])
+        self.plot_efficiency(grid_shape, efficiency_position, rowspan=1, colspan=grid_shape[1])
+        self.sleep_fig.tight_layout()
+        self.plot_polar_hypnograms(grid_shape, row=grid_shape[0] - 1)
+
+        return self.sleep_fig
+
+    def __getstate__(self):
+        """
+        drop figure and artists when pickled, so synced sleep data can be plotted in other processes
+        :return: dictionary of instance attributes
+        """
+
+        state = self.__dict__.copy()
+        state.update(figure=None, stages_artists=None, efficiency_artists=None, hypnogram_artists=None)
+
+        return state
+
+    def update_plots(self):
+        """
+        update artists of existing plots in place with current sleep data
+        :return: list of axes updated
+        """
+
+        axes = []
+        if self.stages_artists is not None:
+            axes += self.update_stages_percent()
+        if self.efficiency_artists is not None:
+            axes += self.update_efficiency()
+        if self.hypnogram_artists is not None:
+            axes += self.update_polar_hypnograms()
+
+        return axes
 
 
 # EXAMPLE using Sleep()
@@ -558,7 +1035,7 @@ class Sleep(object):
 # sleep plots
 tokens_fp = '/home/sosa/Documents/IoTHealth/fitbit_tokens.txt'
 sleep_logs_fp = '/home/sosa/Documents/IoTHealth/sleep.csv'
-sleep_series_fp = '/home/sosa/Documents/IoTHealth/sleep_series.json'
+sleep_series_fp = '/home/sosa/Documents/IoTHealth/sleep_series'
 
 # fig parameters
 grid_shape = (4, 15)
@@ -0,0 +1,240 @@
+import os
+import numpy as np
+
+
+# stage codes stored for each epoch, short wake epochs come from levels.shortData
+STAGE_CODES = {'deep': 0, 'light': 1, 'rem': 2, 'wake': 3}
+SHORT_WAKE_CODE = 4
+
+
+class SleepSeries(object):
+    """
+    columnar store of sleep epochs:
+        -one row per night in dates and offsets
+        -one row per epoch in start_times, durations and stages
+
+    stored as directory of append-only files:
+        -nights.bin: fixed-size (dateOfSleep, end offset) records indexing nights to epoch offsets
+        -start_times.bin, durations.bin, stages.bin: raw epoch columns
+    """
+    columns = {'start_times': np.int64,
+               'durations': np.int32,
+               'stages': np.uint8}
+    night_dtype = np.dtype([('date', '<i8'), ('end', '<i8')])
+
+    def __init__(self, dates, offsets, start_times, durations, stages):
+        """
+        initialize columns of sleep epochs
+        :param dates: array of datetime64[D] nights, ascending
+        :param offsets: array of len(dates)+1 epoch offsets, night i spans offsets[i]:offsets[i+1]
+        :param start_times: array of int64 epoch start times, seconds since 1970 in local time
+        :param durations: array of int32 epoch durations in seconds
+        :param stages: array of uint8 stage codes
+        """
+
+        self.dates = dates
+        self.offsets = offsets
+        self.start_times = start_times
+        self.durations = durations
+        self.stages = stages
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def map_file(file_path, dtype, count=None):
+        """
+        memory-map binary file as read-only array of complete records
+        :param file_path: string of absolute file-path
+        :param dtype: numpy dtype of records
+        :param count: integer of records to map, default maps all complete records
+        :return: numpy memmap, or empty array if no records
+        """
+
+        if count is None:
+            count = os.path.getsize(file_path) // np.dtype(dtype).itemsize
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+
+        return np.memmap(file_path, dtype=dtype, mode='r', shape=(count,))
+
+    @classmethod
+    def load(cls, dir_path, nights=None):
+        """
+        load series from directory using memory-mapped reads
+        :param dir_path: string of absolute path to series directory
+        :param nights: integer of most recent nights to load, default maps all nights
+        :return: SleepSeries
+        """
+
+        # map committed nights, their end offsets bound epochs of interrupted appends
+        night_index = cls.map_file(os.path.join(dir_path, 'nights.bin'), cls.night_dtype)
+        first_night = max(0, len(night_index) - nights) if nights is not None else 0
+        records = night_index[first_night:]
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        offsets[1:] = records['end']
+        if first_night:
+            offsets[0] = night_index['end'][first_night - 1]
+
+        # memory-map epoch columns so only sliced bytes are read from disk
+        columns = {label: cls.map_file(os.path.join(dir_path, label + '.bin'), dtype, offsets[-1])
+                   for label, dtype in cls.columns.items()}
+        series = cls(records['date'].view('datetime64[D]'), offsets, **columns)
+
+        if nights is not None:
+            series = series.tail(nights)
+
+        return series
+
+    def save(self, dir_path):
+        """
+        write series to directory, replacing existing files
+        :param dir_path: string of absolute path to series directory
+        """
+
+        os.makedirs(dir_path, exist_ok=True)
+
+        # truncate night index first, so an interrupted save leaves an empty store
+        open(os.path.join(dir_path, 'nights.bin'), 'wb').close()
+        for label in self.columns:
+            open(os.path.join(dir_path, label + '.bin'), 'wb').close()
+
+        self.append_to(dir_path)
+
+    def append_to(self, dir_path):
+        """
+        append nights of series to directory
+        epoch columns are written and flushed before night index, which commits the nights
+        :param dir_path: string of absolute path to series directory
+        """
+
+        # capture committed end of stored epochs
+        nights_path = os.path.join(dir_path, 'nights.bin')
+        stored = self.map_file(nights_path, self.night_dtype)
+        stored_end = int(stored['end'][-1]) if len(stored) else 0
+
+        # append epoch columns after committed epochs, dropping epochs of interrupted appends
+        for label, dtype in self.columns.items():
+            with open(os.path.join(dir_path, label + '.bin'), 'rb+') as column_file:
+                column_file.truncate(stored_end * np.dtype(dtype).itemsize)
+                column_file.seek(0, os.SEEK_END)
+                column_file.write(np.ascontiguousarray(getattr(self, label), dtype=dtype).tobytes())
+                column_file.flush()
+                os.fsync(column_file.fileno())
+
+        # append night records, dropping partial record of interrupted append
+        records = np.zeros(len(self), dtype=self.night_dtype)
+        records['date'] = np.asarray(self.dates, dtype='datetime64[D]').astype(np.int64)
+        records['end'] = np.asarray(self.offsets[1:]) - self.offsets[0] + stored_end
+        with open(nights_path, 'rb+') as nights_file:
+            nights_file.truncate(len(stored) * self.night_dtype.itemsize)
+            nights_file.seek(0, os.SEEK_END)
+            nights_file.write(records.tobytes())
+            nights_file.flush()
+            os.fsync(nights_file.fileno())
+
+    def tail(self, nights):
+        """
+        slice most recent nights, reading only their epochs
+        :param nights: integer of most recent nights
+        :return: SleepSeries with offsets rebased to 0
+        """
+
+        nights = min(nights, len(self))
+
+        return self.slice(len(self) - nights, len(self))
+
+    def between(self, start_date, end_date):
+        """
+        slice nights within date range, reading only their epochs
+        :param start_date: string of start date (YYYY-mm-dd format)
+        :param end_date: string of end date (YYYY-mm-dd format)
+        :return: SleepSeries with offsets rebased to 0
+        """
+
+        first = np.searchsorted(self.dates, np.datetime64(start_date, 'D'), side='left')
+        last = np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='right')
+
+        return self.slice(first, last)
+
+    def slice(self, first_night, last_night):
+        """
+        slice nights by index, copying only their epochs into memory
+        :param first_night: integer index of first night
+        :param last_night: integer index after last night
+        :return: SleepSeries with offsets rebased to 0
+        """
+
+        offsets = np.array(self.offsets[first_night:last_night + 1], dtype=np.int64)
+        first, last = offsets[0], offsets[-1]
+
+        return SleepSeries(np.array(self.dates[first_night:last_night]),
+                           offsets - first,
+                           np.array(self.start_times[first:last]),
+                           np.array(self.durations[first:last]),
+                           np.array(self.stages[first:last]))
+
+    def night(self, index):
+        """
+        capture epochs of single night
+        :param index: integer index of night, negative indexes count from latest night
+        :return: dictionary of dateOfSleep string and epoch arrays
+        """
+
+        index = index % len(self)
+        first, last = self.offsets[index], self.offsets[index+1]
+
+        return {'dateOfSleep': str(self.dates[index]),
+                'start_times': np.asarray(self.start_times[first:last]).astype('datetime64[s]'),
+                'durations': np.asarray(self.durations[first:last]),
+                'stages': np.asarray(self.stages[first:last])}
+
+    @property
+    def missing_dates(self):
+        """
+        :return: array of datetime64[D] nights without epochs
+        """
+
+        return np.asarray(self.dates)[np.diff(self.offsets) == 0]
+
+    @property
+    def latest_date(self):
+        """
+        :return: string of latest dateOfSleep (YYYY-mm-dd format)
+        """
+
+        return str(self.dates[-1])
+
+    @classmethod
+    def from_json(cls, json_series):
+        """
+        convert sleep series in json form to columns
+        :param json_series: dictionary of {"sleep": [series, ...]} form, ordered by dateOfSleep
+        :return: SleepSeries
+        """
+
+        # initialize parameters
+        dates = []
+        offsets = [0]
+        start_times = []
+        durations = []
+        stages = []
+
+        # flatten stages of each night, skipping placeholder epochs of missing nights
+        for series in json_series["sleep"]:
+            dates.append(series["dateOfSleep"])
+            levels = [(series["data"][stage], code) for stage, code in STAGE_CODES.items()]
+            levels.append((series["shortData"]["wake"], SHORT_WAKE_CODE))
+            for level, code in levels:
+                for start_time, duration in zip(level["start_times"], level["epoch_durations"]):
+                    if isinstance(start_time, (str,)):
+                        start_times.append(start_time)
+                        durations.append(duration)
+                        stages.append(code)
+            offsets.append(len(start_times))
+
+        return cls(np.array(dates, dtype='datetime64[D]'),
+                   np.array(offsets, dtype=np.int64),
+                   np.array(start_times, dtype='datetime64[s]').astype(np.int64),
+                   np.array(durations, dtype=np.int32),
+                   np.array(stages, dtype=np.uint8))
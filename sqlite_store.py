@@ -0,0 +1,327 @@
+from IoTHealth.sleep_series import SleepSeries
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+
+def quote(name):
+    """
+    :param name: string of table or column name, such as 'fat_%'
+    :return: string of quoted SQL identifier
+    """
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteStore(object):
+    """
+    embedded SQLite store of sleep and body data, one table per series keyed by date:
+        -sleep_logs: nightly sleep summaries keyed by dateOfSleep, nights of sleep_epochs
+        -sleep_epochs: sleep epochs keyed by (dateOfSleep, epoch), epoch is position of epoch within night
+        -body_measurements: body composition measurements keyed by time of measurement
+        -body_daily: daily means of body_measurements keyed by date
+        -metadata: text values keyed by name, such as checksums of stored rows
+
+    tables are created WITHOUT ROWID, so rows are stored in key order:
+        -upserts and range reads touch only rows of their date window, not whole history
+        -first and latest dates are read from ends of key index
+    dates are stored as INTEGER seconds since 1970 in local time, as in SleepSeries, in columns declared TIMESTAMP
+    """
+    types = {'M': 'TIMESTAMP', 'i': 'INTEGER', 'u': 'INTEGER', 'b': 'INTEGER', 'f': 'REAL'}
+    epoch_columns = ['start_times', 'durations', 'stages']
+
+    def __init__(self, file_path):
+        """
+        initialize store, database is opened on first access of each thread
+        :param file_path: string of absolute file-path to SQLite database
+        """
+
+        self.file_path = file_path
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        """
+        open connection of calling thread on first access, so data synced on worker thread
+        and plots panned on main thread read and write through their own connections
+        write-ahead log lets reads of one thread proceed during writes of another
+        :return: sqlite3 connection object
+        """
+
+        if getattr(self.local, 'connection', None) is None:
+            connection = sqlite3.connect(self.file_path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute('CREATE TABLE IF NOT EXISTS sleep_epochs (dateOfSleep TIMESTAMP, epoch INTEGER, '
+                               'start_time TIMESTAMP, duration INTEGER, stage INTEGER, '
+                               'PRIMARY KEY (dateOfSleep, epoch)) WITHOUT ROWID')
+            self.local.connection = connection
+
+        return self.local.connection
+
+    def __getstate__(self):
+        """
+        drop connections when pickled, so store can be read in other processes
+        :return: dictionary of instance attributes
+        """
+
+        return {'file_path': self.file_path}
+
+    def __setstate__(self, state):
+        """
+        :param state: dictionary of instance attributes
+        """
+
+        self.__init__(state['file_path'])
+
+    @staticmethod
+    def seconds(dates):
+        """
+        :param dates: datetime index or array of dates
+        :return: array of int64 seconds since 1970
+        """
+
+        return np.asarray(dates, dtype='datetime64[s]').astype(np.int64)
+
+    def columns(self, table):
+        """
+        :param table: string of table name
+        :return: list of (name, declared type, primary key position) tuples, empty if table does not exist
+        """
+
+        rows = self.connection.execute('PRAGMA table_info(' + quote(table) + ')').fetchall()
+
+        return [(name, declared_type, pk) for (cid, name, declared_type, notnull, default, pk) in rows]
+
+    def key(self, table):
+        """
+        :param table: string of table name
+        :return: string of first key column of table
+        """
+
+        return min((pk, name) for (name, declared_type, pk) in self.columns(table) if pk)[1]
+
+    def create_table(self, table, frame):
+        """
+        create table from dtypes of dataFrame, keyed by its index
+        :param table: string of table name
+        :param frame: dataFrame with named index
+        """
+
+        keys = ', '.join(quote(name) for name in frame.index.names)
+        frame = frame.reset_index()
+        definitions = ', '.join(quote(name) + ' ' + self.types.get(dtype.kind, 'TEXT')
+                                for name, dtype in frame.dtypes.items())
+        self.connection.execute('CREATE TABLE IF NOT EXISTS ' + quote(table) + ' (' + definitions +
+                                ', PRIMARY KEY (' + keys + ')) WITHOUT ROWID')
+
+    def rows(self, frame):
+        """
+        :param frame: dataFrame with index of key columns
+        :return: list of row tuples of python values, dates as seconds and nan as None
+        """
+
+        frame = frame.reset_index()
+        for name, dtype in frame.dtypes.items():
+            if dtype.kind == 'M':
+                frame[name] = np.where(frame[name].isna(), None, self.seconds(frame[name].values).astype(object))
+        frame = frame.astype(object).where(frame.notna(), None)
+
+        return list(frame.itertuples(index=False, name=None))
+
+    def upsert(self, table, frame):
+        """
+        insert rows of dataFrame, replacing stored rows of same key, in single transaction
+        table is created from dataFrame on first upsert
+        :param table: string of table name
+        :param frame: dataFrame with index named as key column of table
+        """
+
+        # initialize parameters
+        self.create_table(table, frame)
+        keys = list(frame.index.names)
+        labels = keys + list(frame.columns)
+        updates = ', '.join(quote(label) + '=excluded.' + quote(label) for label in frame.columns)
+        statement = ('INSERT INTO ' + quote(table) + ' (' + ', '.join(quote(label) for label in labels) + ') ' +
+                     'VALUES (' + ', '.join('?' * len(labels)) + ') ' +
+                     'ON CONFLICT (' + ', '.join(quote(key) for key in keys) + ') ' +
+                     ('DO UPDATE SET ' + updates if updates else 'DO NOTHING'))
+
+        # insert rows
+        with self.connection:
+            self.connection.executemany(statement, self.rows(frame))
+
+    def write(self, table, frame):
+        """
+        replace table with rows of dataFrame in single transaction, recreating table from dtypes of dataFrame
+        :param table: string of table name
+        :param frame: dataFrame with named index
+        """
+
+        # begin transaction explicitly, as sqlite3 commits schema changes outside of transactions
+        with self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.execute('DROP TABLE IF EXISTS ' + quote(table))
+            self.upsert(table, frame)
+
+    def count(self, table):
+        """
+        :param table: string of table name
+        :return: integer of rows in table, 0 if table does not exist
+        """
+
+        if not self.columns(table):
+            return 0
+
+        return self.connection.execute('SELECT count(*) FROM ' + quote(table)).fetchone()[0]
+
+    def read_value(self, name):
+        """
+        :param name: string of metadata name
+        :return: string of metadata value, None if not stored
+        """
+
+        if not self.columns('metadata'):
+            return None
+        row = self.connection.execute('SELECT value FROM metadata WHERE name = ?', (name,)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def write_value(self, name, value):
+        """
+        store metadata value, replacing stored value of same name
+        :param name: string of metadata name
+        :param value: string of metadata value
+        """
+
+        self.connection.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID')
+        with self.connection:
+            self.connection.execute('INSERT INTO metadata VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET '
+                                    'value=excluded.value', (name, value))
+
+    def bounds(self, table):
+        """
+        :param table: string of table name
+        :return: tuple of (first, latest) timestamps of key of table, (None, None) if table is empty
+        """
+
+        if not self.columns(table):
+            return None, None
+        key = quote(self.key(table))
+        (first, latest) = self.connection.execute('SELECT min(' + key + '), max(' + key + ') FROM ' +
+                                                  quote(table)).fetchone()
+        if first is None:
+            return None, None
+
+        return pd.Timestamp(first, unit='s'), pd.Timestamp(latest, unit='s')
+
+    def read(self, table, start=None, end=None, neighbours=False):
+        """
+        read rows of table from start to end by range scan of key index
+        :param table: string of table name
+        :param start: datetime of first key, default reads from first row
+        :param end: datetime of last key, default reads to latest row
+        :param neighbours: boolean of reading row before start and row after end, so lines reach window edges
+        :return: dataFrame indexed by key, dates of TIMESTAMP columns as datetime64[ns]
+        """
+
+        # initialize parameters
+        columns = self.columns(table)
+        key = quote(self.key(table))
+        conditions = []
+        parameters = []
+
+        # bound range by start and end, widened to nearest rows outside range when reading neighbours
+        if start is not None:
+            start = int(self.seconds(pd.Timestamp(start)))
+            if neighbours:
+                conditions.append(key + ' >= coalesce((SELECT max(' + key + ') FROM ' + quote(table) +
+                                  ' WHERE ' + key + ' < ?), ?)')
+                parameters += [start, start]
+            else:
+                conditions.append(key + ' >= ?')
+                parameters.append(start)
+        if end is not None:
+            end = int(self.seconds(pd.Timestamp(end)))
+            if neighbours:
+                conditions.append(key + ' <= coalesce((SELECT min(' + key + ') FROM ' + quote(table) +
+                                  ' WHERE ' + key + ' > ?), ?)')
+                parameters += [end, end]
+            else:
+                conditions.append(key + ' <= ?')
+                parameters.append(end)
+
+        # read rows in key order
+        statement = 'SELECT * FROM ' + quote(table)
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        rows = self.connection.execute(statement + ' ORDER BY ' + key, parameters).fetchall()
+        frame = pd.DataFrame.from_records(rows, columns=[name for (name, declared_type, pk) in columns])
+
+        # restore dtypes from declared types
+        for name, declared_type, pk in columns:
+            if declared_type == 'TIMESTAMP':
+                frame[name] = pd.to_datetime(frame[name], unit='s').astype('datetime64[ns]')
+            elif declared_type == 'REAL':
+                frame[name] = frame[name].astype(float)
+
+        return frame.set_index(self.key(table))
+
+    def write_series(self, series):
+        """
+        upsert nights of series into sleep_epochs, replacing stored epochs of each night in single transaction
+        :param series: SleepSeries
+        """
+
+        # initialize parameters
+        dates = self.seconds(np.asarray(series.dates, dtype='datetime64[D]'))
+        offsets = np.asarray(series.offsets, dtype=np.int64)
+        counts = np.diff(offsets)
+        epochs = np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], counts)
+        rows = zip(np.repeat(dates, counts).tolist(), epochs.tolist(),
+                   *[np.asarray(getattr(series, label)).tolist() for label in self.epoch_columns])
+
+        # replace epochs of nights
+        with self.connection:
+            self.connection.executemany('DELETE FROM sleep_epochs WHERE dateOfSleep = ?',
+                                        [(date,) for date in dates.tolist()])
+            self.connection.executemany('INSERT INTO sleep_epochs VALUES (?, ?, ?, ?, ?)', rows)
+
+    def read_series(self, start, end):
+        """
+        read nights of sleep_logs from start to end and their epochs by range scans of key indexes
+        :param start: datetime of first dateOfSleep
+        :param end: datetime of last dateOfSleep
+        :return: SleepSeries, nights without epochs recorded as empty offset spans
+        """
+
+        # read nights and their epochs in key order
+        bounds = [int(self.seconds(pd.Timestamp(start))), int(self.seconds(pd.Timestamp(end)))]
+        nights = self.connection.execute('SELECT dateOfSleep FROM sleep_logs WHERE dateOfSleep BETWEEN ? AND ? '
+                                         'ORDER BY dateOfSleep', bounds).fetchall()
+        epochs = self.connection.execute('SELECT dateOfSleep, start_time, duration, stage FROM sleep_epochs '
+                                         'WHERE dateOfSleep BETWEEN ? AND ? ORDER BY dateOfSleep, epoch',
+                                         bounds).fetchall()
+        nights = np.array([night for (night,) in nights], dtype=np.int64)
+        epochs = np.array(epochs, dtype=np.int64).reshape(-1, 4)
+
+        # index epochs of each night by offsets
+        offsets = np.append(np.searchsorted(epochs[:, 0], nights, side='left'), len(epochs)).astype(np.int64)
+
+        return SleepSeries(nights.astype('datetime64[s]').astype('datetime64[D]'), offsets, epochs[:, 1],
+                           epochs[:, 2].astype(np.int32), epochs[:, 3].astype(np.uint8))
+
+
+# EXAMPLE using SQLiteStore()
+"""
+# initialize parameters
+store = SQLiteStore('/home/sosa/Documents/IoTHealth/health.db')
+days = pd.date_range('2018-08-07', '2018-08-21', freq='D', name='dateOfSleep')
+logs = pd.DataFrame({'deep': 60.0, 'duration': 450.0}, index=days)
+
+# upsert nights, then read last week by range scan of key index
+store.upsert('sleep_logs', logs)
+print(store.bounds('sleep_logs'))
+print(store.read('sleep_logs', start='2018-08-15', end='2018-08-21'))
+"""